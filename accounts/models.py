@@ -91,11 +91,44 @@ class UserProfile(models.Model):
         self.monthly_used = 0
         self.save(update_fields=['monthly_used', 'updated_at'])
 
+    @staticmethod
+    def usage_history_cache_key(user_id, months):
+        """
+        利用履歴キャッシュのキーを返す
+
+        キーにユーザー単位のバージョンを含めることで、
+        無効化時に期間ごとのキーを列挙せずに済むようにする。
+
+        Args:
+            user_id (int): ユーザーID
+            months (int): 集計期間（月数）
+
+        Returns:
+            str: キャッシュキー
+        """
+        version = cache.get_or_set(f'usage_history_ver:{user_id}', 1, timeout=None)
+        return f'usage_history:{user_id}:{months}:v{version}'
+
+    @staticmethod
+    def invalidate_usage_cache_for(user_id):
+        """
+        指定ユーザーの利用状況キャッシュを無効化
+
+        利用履歴はバージョンを進めることで全期間分をまとめて無効化する。
+
+        Args:
+            user_id (int): ユーザーID
+        """
+        cache.delete(f'usage_summary:{user_id}')
+        version_key = f'usage_history_ver:{user_id}'
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            cache.set(version_key, 1, timeout=None)
+
     def invalidate_usage_cache(self):
         """利用状況キャッシュを無効化"""
-        cache.delete(f'usage_summary:{self.user_id}')
-        for months in range(1, 13):
-            cache.delete(f'usage_history:{self.user_id}:{months}')
+        self.invalidate_usage_cache_for(self.user_id)
 
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
@@ -7,7 +7,6 @@ accountsアプリのDjangoシグナル
 import logging
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
 
 from accounts.models import UserProfile
 
@@ -24,12 +23,8 @@ def clear_user_profile_cache(sender, instance, **kwargs):
     try:
         user_id = instance.user_id
 
-        # 該当ユーザーの利用状況キャッシュをクリア
-        cache.delete(f'usage_summary:{user_id}')
-
-        # 利用履歴キャッシュもクリア（1-12ヶ月分）
-        for months in range(1, 13):
-            cache.delete(f'usage_history:{user_id}:{months}')
+        # 該当ユーザーの利用状況・利用履歴キャッシュを無効化
+        UserProfile.invalidate_usage_cache_for(user_id)
 
         logger.info(f"Cleared usage cache for user {user_id} after UserProfile changed")
     except Exception as e:
@@ -9,9 +9,10 @@ from images.models import ImageConversion
 
 
 class UserProfileModelTests(TestCase):
-    def setUp(self):
-        self.User = get_user_model()
-        self.user = self.User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.User = get_user_model()
+        cls.user = cls.User.objects.create_user(
             username='tester', email='tester@example.com', password='secret123'
         )
 
@@ -43,7 +44,7 @@ class UserProfileModelTests(TestCase):
     def test_cache_invalidated_on_save(self):
         profile = self.user.profile
         cache_key = f'usage_summary:{self.user.id}'
-        cache_history_key = f'usage_history:{self.user.id}:6'
+        cache_history_key = UserProfile.usage_history_cache_key(self.user.id, 6)
 
         cache.set(cache_key, {'dummy': True}, 60)
         cache.set(cache_history_key, [{'month': '2025-10'}], 60)
@@ -51,7 +52,8 @@ class UserProfileModelTests(TestCase):
         profile.increment_usage(1)
 
         self.assertIsNone(cache.get(cache_key))
-        self.assertIsNone(cache.get(cache_history_key))
+        self.assertNotEqual(UserProfile.usage_history_cache_key(self.user.id, 6), cache_history_key)
+        self.assertIsNone(cache.get(UserProfile.usage_history_cache_key(self.user.id, 6)))
 
 
 class ResetMonthlyUsageCommandTests(TestCase):
@@ -1,14 +1,12 @@
-import io
 import json
 import os
 import shutil
-import tempfile
 from decimal import Decimal
 from datetime import timedelta
+from pathlib import Path
 from types import SimpleNamespace
 from unittest.mock import patch
 
-from PIL import Image
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.cache import cache
@@ -17,10 +15,16 @@ from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
 
+from config.test_utils import TempMediaRootMixin
 from images.models import ImageConversion, GeneratedImage
 from images.services.brightness import BrightnessAdjustmentService
 from images.services.upload import ImageUploadService
 
+# テスト用のJPEGは事前にエンコードしてリポジトリに同梱し、実行時は読み込むだけにする
+TESTDATA_DIR = Path(__file__).resolve().parent / 'testdata'
+UPLOAD_JPEG = (TESTDATA_DIR / 'upload_64x64.jpg').read_bytes()
+GENERATED_JPEG = (TESTDATA_DIR / 'generated_64x64.jpg').read_bytes()
+
 
 class AuthAPITestCase(TestCase):
     """認証APIのユニットテスト"""
@@ -201,16 +205,14 @@ class UsageAPITestCase(TestCase):
         self.assertEqual(response.status_code, 401)
 
 
-class ConvertAPITestCase(TestCase):
+class ConvertAPITestCase(TempMediaRootMixin, TestCase):
     """
     画像変換APIの挙動を検証するテストケース
     """
 
-    def setUp(self):
-        self.temp_media = tempfile.mkdtemp()
-        self.override = override_settings(MEDIA_ROOT=self.temp_media)
-        self.override.enable()
+    clear_media_after_each_test = True
 
+    def setUp(self):
         self.user = User.objects.create_user(
             username='tester',
             email='tester@example.com',
@@ -221,21 +223,13 @@ class ConvertAPITestCase(TestCase):
         self.convert_url = reverse('api:convert_start')
         self.status_url = lambda pk: reverse('api:convert_status', kwargs={'conversion_id': pk})
 
-    def tearDown(self):
-        self.override.disable()
-        shutil.rmtree(self.temp_media, ignore_errors=True)
-
     def _make_test_image(self, filename='sample.jpg'):
         """
         テスト用の画像ファイルを生成
         """
-        buffer = io.BytesIO()
-        image = Image.new('RGB', (64, 64), color=(255, 255, 255))
-        image.save(buffer, format='JPEG')
-        buffer.seek(0)
         return SimpleUploadedFile(
             filename,
-            buffer.read(),
+            UPLOAD_JPEG,
             content_type='image/jpeg'
         )
 
@@ -360,12 +354,11 @@ class ConvertAPITestCase(TestCase):
         self.assertEqual(response.json()['status'], 'error')
 
 
-class GalleryAPITestCase(TestCase):
-    def setUp(self):
-        self.temp_media = tempfile.mkdtemp()
-        self.override = override_settings(MEDIA_ROOT=self.temp_media, ALLOWED_HOSTS=['testserver', 'localhost'])
-        self.override.enable()
+@override_settings(ALLOWED_HOSTS=['testserver', 'localhost'])
+class GalleryAPITestCase(TempMediaRootMixin, TestCase):
+    clear_media_after_each_test = True
 
+    def setUp(self):
         self.user = User.objects.create_user(
             username='gallery_user', email='gallery@example.com', password='password123'
         )
@@ -385,8 +378,8 @@ class GalleryAPITestCase(TestCase):
         self.generated_path = os.path.join('generated', 'user_1', 'generated.jpg')
         full_generated_path = os.path.join(self.temp_media, self.generated_path)
         os.makedirs(os.path.dirname(full_generated_path), exist_ok=True)
-        with Image.new('RGB', (64, 64), color=(200, 200, 200)) as img:
-            img.save(full_generated_path, format='JPEG')
+        with open(full_generated_path, 'wb') as fh:
+            fh.write(GENERATED_JPEG)
 
         self.generated_image = GeneratedImage.objects.create(
             conversion=self.conversion,
@@ -395,10 +388,6 @@ class GalleryAPITestCase(TestCase):
             image_size=4,
         )
 
-    def tearDown(self):
-        self.override.disable()
-        shutil.rmtree(self.temp_media, ignore_errors=True)
-
     def test_gallery_list_returns_conversions(self):
         response = self.client.get('/api/v1/gallery/')
         self.assertEqual(response.status_code, 200)
@@ -492,16 +481,8 @@ class GalleryAPITestCase(TestCase):
         self.assertEqual(response.status_code, 404)
 
 
-class IntegrationFlowTests(TestCase):
-    def setUp(self):
-        self.temp_media = tempfile.mkdtemp()
-        self.override = override_settings(MEDIA_ROOT=self.temp_media, ALLOWED_HOSTS=['testserver', 'localhost'])
-        self.override.enable()
-
-    def tearDown(self):
-        self.override.disable()
-        shutil.rmtree(self.temp_media, ignore_errors=True)
-
+@override_settings(ALLOWED_HOSTS=['testserver', 'localhost'])
+class IntegrationFlowTests(TempMediaRootMixin, TestCase):
     @patch('api.views.convert.process_image_conversion.delay')
     @patch('images.tasks.GeminiImageAPIService.save_generated_image')
     @patch('images.tasks.GeminiImageAPIService.generate_images_from_reference')
@@ -528,7 +509,7 @@ class IntegrationFlowTests(TestCase):
             os.makedirs(os.path.dirname(full_path), exist_ok=True)
             with open(full_path, 'wb') as fh:
                 fh.write(image_data)
-            return relative
+            return relative, len(image_data)
 
         mock_save.side_effect = save_generated
 
@@ -541,8 +522,7 @@ class IntegrationFlowTests(TestCase):
         mock_delay.side_effect = run_task
 
         upload_path = os.path.join(self.temp_media, 'upload.jpg')
-        with Image.new('RGB', (64, 64), color=(100, 100, 200)) as img:
-            img.save(upload_path, format='JPEG')
+        shutil.copyfile(TESTDATA_DIR / 'upload_64x64.jpg', upload_path)
 
         with open(upload_path, 'rb') as f:
             response = client.post(
@@ -573,12 +553,9 @@ class IntegrationFlowTests(TestCase):
         self.assertEqual(gallery_payload['conversions'][0]['aspect_ratio'], '3:4')
 
 
-class GalleryPerformanceTests(TestCase):
+@override_settings(ALLOWED_HOSTS=['testserver', 'localhost'])
+class GalleryPerformanceTests(TempMediaRootMixin, TestCase):
     def setUp(self):
-        self.temp_media = tempfile.mkdtemp()
-        self.override = override_settings(MEDIA_ROOT=self.temp_media, ALLOWED_HOSTS=['testserver', 'localhost'])
-        self.override.enable()
-
         self.user = User.objects.create_user('perf', 'perf@example.com', 'password123')
         self.client.login(username='perf', password='password123')
 
@@ -597,8 +574,7 @@ class GalleryPerformanceTests(TestCase):
             image_rel = os.path.join('generated', f'user_{self.user.id}', f'generated_{index}.jpg')
             full_path = os.path.join(self.temp_media, image_rel)
             os.makedirs(os.path.dirname(full_path), exist_ok=True)
-            with Image.new('RGB', (32, 32), color=(index * 40, index * 40, 200)) as img:
-                img.save(full_path, format='JPEG')
+            shutil.copyfile(TESTDATA_DIR / 'generated_64x64.jpg', full_path)
 
             GeneratedImage.objects.create(
                 conversion=conv,
@@ -607,10 +583,6 @@ class GalleryPerformanceTests(TestCase):
                 image_size=1024,
             )
 
-    def tearDown(self):
-        self.override.disable()
-        shutil.rmtree(self.temp_media, ignore_errors=True)
-
     def test_gallery_list_queries(self):
         with self.assertNumQueries(5):
             response = self.client.get('/api/v1/gallery/?per_page=12')
@@ -89,7 +89,7 @@ def prompts_list(request):
             return JsonResponse(response_data)
 
         # 非ログイン時はキャッシュを使用
-        cache_key = f"prompts_list:{category if category else 'all'}"
+        cache_key = PromptPreset.cache_key(f"prompts_list:{category if category else 'all'}")
 
         # キャッシュから取得
         cached_data = cache.get(cache_key)
@@ -159,7 +159,7 @@ def prompts_categories(request):
     """
     try:
         # キャッシュキー
-        cache_key = "prompts_categories"
+        cache_key = PromptPreset.cache_key("prompts_categories")
 
         # キャッシュから取得
         cached_data = cache.get(cache_key)
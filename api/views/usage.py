@@ -9,6 +9,7 @@ from django.db.models import Sum, Count
 from django.db.models.functions import TruncMonth
 from django.utils import timezone
 
+from accounts.models import UserProfile
 from api.decorators import login_required_api
 from images.models import ImageConversion
 
@@ -101,7 +102,7 @@ def usage_history(request):
 
     months = max(1, min(months, 12))
 
-    cache_key = f'usage_history:{request.user.id}:{months}'
+    cache_key = UserProfile.usage_history_cache_key(request.user.id, months)
     cached = cache.get(cache_key)
     if cached:
         return JsonResponse({
@@ -0,0 +1,26 @@
+"""
+テスト用のDjango設定
+
+`python manage.py test --settings=config.test_settings` で使用する。
+"""
+
+from .settings import *  # noqa: F401,F403
+
+# テストではパスワードの強度は不要なため、高速なハッシャーでユーザー作成を軽くする
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+]
+
+# 並列実行（--parallel）のワーカー間でRedisを共有すると、cache.clear() や
+# IDベースのキーが互いに干渉するため、プロセスごとのインメモリ実装を使う
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
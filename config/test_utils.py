@@ -0,0 +1,44 @@
+"""
+テスト共通ユーティリティ
+
+複数アプリのテストで共有するヘルパーをまとめる。
+"""
+
+import os
+import shutil
+import tempfile
+
+from django.test import override_settings
+
+
+# テスト用メディアは永続性が不要なため、使える場合はtmpfs上に作成する
+TEMP_BASE_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+class TempMediaRootMixin:
+    """
+    MEDIA_ROOTの差し替えをテストごとではなくクラスで1回だけ行う
+
+    一時ディレクトリは並列実行のワーカーごとに分かれるよう setUpClass で作成する。
+    テスト中にファイルを書き込むクラスは clear_media_after_each_test を True にし、
+    各テストの終了時に中身を空にしてテスト間の独立性を保つ。
+    """
+
+    clear_media_after_each_test = False
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_media = tempfile.mkdtemp(dir=TEMP_BASE_DIR)
+        cls.addClassCleanup(shutil.rmtree, cls.temp_media, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.temp_media))
+        super().setUpClass()
+
+    def tearDown(self):
+        if self.clear_media_after_each_test:
+            with os.scandir(self.temp_media) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        shutil.rmtree(entry.path, ignore_errors=True)
+                    else:
+                        os.unlink(entry.path)
+        super().tearDown()
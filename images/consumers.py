@@ -6,6 +6,7 @@ import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from .models import ImageConversion
 
 
@@ -41,6 +42,15 @@ class ImageConversionConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
 
+        # 単一接続ならタスクから直接送信できるようチャネル名を記録（複数接続時はグループ送信に任せる）
+        channel_key = ImageConversion.channel_name_key(self.conversion_id)
+        if not await cache.aadd(channel_key, self.channel_name, ImageConversion.CHANNEL_NAME_TIMEOUT):
+            await cache.aset(
+                channel_key,
+                ImageConversion.CHANNEL_NAME_MULTIPLE,
+                ImageConversion.CHANNEL_NAME_TIMEOUT,
+            )
+
         await self.accept()
 
     async def disconnect(self, close_code):
@@ -57,6 +67,10 @@ class ImageConversionConsumer(AsyncWebsocketConsumer):
                 self.channel_name
             )
 
+            channel_key = ImageConversion.channel_name_key(self.conversion_id)
+            if await cache.aget(channel_key) == self.channel_name:
+                await cache.adelete(channel_key)
+
     async def receive(self, text_data):
         """
         クライアントからメッセージを受信
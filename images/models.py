@@ -4,12 +4,18 @@ Image conversion models for the image conversion system.
 
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+import logging
 import uuid
 import os
 
 
+logger = logging.getLogger(__name__)
+
+
 def upload_image_path(instance, filename):
     """
     アップロード画像の保存パスを生成
@@ -73,6 +79,13 @@ class ImageConversion(models.Model):
         ('cancelled', 'キャンセル'),
     ]
 
+    # キャンセルフラグの保持期間（秒）
+    CANCEL_FLAG_TIMEOUT = 60 * 60
+
+    # 購読中WebSocketのチャネル名の保持期間（秒）と、複数接続を示す値
+    CHANNEL_NAME_TIMEOUT = 60 * 60
+    CHANNEL_NAME_MULTIPLE = '*'
+
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -197,6 +210,7 @@ class ImageConversion(models.Model):
         self.status = 'completed'
         self.processing_time = processing_time
         self.save(update_fields=['status', 'processing_time', 'updated_at'])
+        cache.delete(self.cancel_flag_key(self.id))
 
     def mark_as_failed(self, error_message):
         """
@@ -208,11 +222,80 @@ class ImageConversion(models.Model):
         self.status = 'failed'
         self.error_message = error_message
         self.save(update_fields=['status', 'error_message', 'updated_at'])
+        cache.delete(self.cancel_flag_key(self.id))
 
     def mark_as_cancelled(self):
-        """キャンセルステータスに更新"""
+        """
+        キャンセルステータスに更新
+
+        処理中タスクがDBを参照せずに検知できるよう、コミット後にキャンセルフラグをキャッシュに立てる。
+        """
         self.status = 'cancelled'
         self.save(update_fields=['status', 'updated_at'])
+        cancel_flag_key = self.cancel_flag_key(self.id)
+        transaction.on_commit(
+            lambda: cache.set(cancel_flag_key, 1, timeout=self.CANCEL_FLAG_TIMEOUT)
+        )
+
+    @staticmethod
+    def cancel_flag_key(conversion_id):
+        """
+        キャンセルフラグのキャッシュキーを返す
+
+        Args:
+            conversion_id (int): 変換履歴ID
+
+        Returns:
+            str: キャッシュキー
+        """
+        return f'conversion_cancel:{conversion_id}'
+
+    @classmethod
+    def is_cancel_flagged(cls, conversion_id):
+        """
+        キャンセルフラグが立っているかを返す
+
+        Args:
+            conversion_id (int): 変換履歴ID
+
+        Returns:
+            bool: キャンセル済みの場合True
+        """
+        return bool(cache.get(cls.cancel_flag_key(conversion_id)))
+
+    @staticmethod
+    def channel_name_key(conversion_id):
+        """
+        進捗を購読しているWebSocketのチャネル名のキャッシュキーを返す
+
+        Args:
+            conversion_id (int): 変換履歴ID
+
+        Returns:
+            str: キャッシュキー
+        """
+        return f'conversion_channel:{conversion_id}'
+
+    @classmethod
+    def get_single_channel_name(cls, conversion_id):
+        """
+        購読者が1接続のみの場合にそのチャネル名を返す
+
+        Args:
+            conversion_id (int): 変換履歴ID
+
+        Returns:
+            str | None: チャネル名（未接続・複数接続・キャッシュ障害時はNone）
+        """
+        # キャッシュ障害時はグループ送信に任せ、通知のために変換処理を失敗させない
+        try:
+            channel_name = cache.get(cls.channel_name_key(conversion_id))
+        except Exception as error:
+            logger.warning("Failed to read channel name for conversion %s: %s", conversion_id, error)
+            return None
+        if not channel_name or channel_name == cls.CHANNEL_NAME_MULTIPLE:
+            return None
+        return channel_name
 
 
 class GeneratedImage(models.Model):
@@ -324,6 +407,9 @@ class PromptPreset(models.Model):
         ('other', 'その他'),
     ]
 
+    # プリセット関連キャッシュのバージョンキー
+    CACHE_VERSION_KEY = 'prompts_ver'
+
     name = models.CharField(
         max_length=100,
         verbose_name='プリセット名',
@@ -377,6 +463,30 @@ class PromptPreset(models.Model):
     def __str__(self):
         return f'{self.name} ({self.get_category_display()})'
 
+    @classmethod
+    def cache_key(cls, name):
+        """
+        プリセット関連キャッシュのキーを返す
+
+        キーに全体のバージョンを含め、無効化はバージョンの更新で行う。
+
+        Args:
+            name (str): キャッシュ名（例: prompts_list:all）
+
+        Returns:
+            str: キャッシュキー
+        """
+        version = cache.get_or_set(cls.CACHE_VERSION_KEY, 1, timeout=None)
+        return f'{name}:v{version}'
+
+    @classmethod
+    def invalidate_cache(cls):
+        """プリセット関連キャッシュをまとめて無効化"""
+        try:
+            cache.incr(cls.CACHE_VERSION_KEY)
+        except ValueError:
+            cache.set(cls.CACHE_VERSION_KEY, 1, timeout=None)
+
 
 
 class UserFavoritePrompt(models.Model):
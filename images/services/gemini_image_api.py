@@ -5,7 +5,8 @@ Vertex AI経由でGemini 2.5 Flash Imageを使用した画像生成サービス
 """
 import os
 import logging
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Tuple
 from pathlib import Path
 from PIL import Image as PILImage
 from google import genai
@@ -18,7 +19,26 @@ logger = logging.getLogger(__name__)
 
 class GeminiImageAPIError(Exception):
     """Gemini Image API関連のエラー"""
-    pass
+
+    def __init__(self, message: str = '', status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+    @property
+    def retryable(self) -> bool:
+        """レート制限(429)・サーバーエラー(5xx)など、再試行で回復し得るエラーかどうか"""
+        return self.status_code == 429 or (
+            self.status_code is not None and 500 <= self.status_code < 600
+        )
+
+
+def _status_code_of(error: Exception):
+    """例外からHTTPステータスコードを取り出す（取得できない場合はNone）"""
+    for attr in ('status_code', 'code'):
+        code = getattr(error, attr, None)
+        if isinstance(code, int):
+            return code
+    return None
 
 
 class GeminiImageAPIService:
@@ -45,6 +65,9 @@ class GeminiImageAPIService:
     # デフォルトのアスペクト比
     DEFAULT_ASPECT_RATIO = ORIGINAL_ASPECT_RATIO
 
+    # 同時に実行する生成リクエストの最大数
+    MAX_GENERATION_WORKERS = 5
+
     @classmethod
     def initialize_client(cls) -> genai.Client:
         """
@@ -136,7 +159,7 @@ class GeminiImageAPIService:
         image_data: bytes,
         output_dir: str,
         filename: str
-    ) -> str:
+    ) -> Tuple[str, int]:
         """
         生成された画像を保存
 
@@ -146,7 +169,7 @@ class GeminiImageAPIService:
             filename: ファイル名
 
         Returns:
-            str: 保存されたファイルのパス（MEDIA_ROOT相対）
+            tuple: (保存されたファイルのパス（MEDIA_ROOT相対）, 書き込んだバイト数)
 
         Raises:
             GeminiImageAPIError: 保存に失敗した場合
@@ -162,13 +185,11 @@ class GeminiImageAPIService:
 
             # 画像を保存
             with open(output_path, 'wb') as f:
-                f.write(image_data)
+                file_size = f.write(image_data)
 
-            # ファイルサイズを確認
-            file_size = os.path.getsize(output_path)
             logger.info(f"Image saved: {output_path}, size: {file_size} bytes")
 
-            return relative_path
+            return relative_path, file_size
 
         except Exception as e:
             logger.error(f"Failed to save image: {str(e)}")
@@ -238,93 +259,43 @@ class GeminiImageAPIService:
             if aspect_ratio != cls.ORIGINAL_ASPECT_RATIO:
                 resolved_aspect_ratio = aspect_ratio
 
-            results = []
-
-            # 指定回数分生成
-            fallback_count = 0
-
-            for i in range(generation_count):
-                try:
-                    # バリエーション用のプロンプト構築
-                    full_prompt = cls._build_variation_prompt(prompt, i + 1)
+            image_config = None
+            if resolved_aspect_ratio:
+                image_config = types.ImageConfig(
+                    aspect_ratio=resolved_aspect_ratio,
+                )
 
-                    logger.info(
-                        f"Generating image {i + 1}/{generation_count} "
-                        f"with prompt: {full_prompt[:100]}..."
-                    )
+            def _generate_nth(generation_number: int):
+                return cls._generate_one(
+                    client=client,
+                    image_data=image_data,
+                    prompt=prompt,
+                    generation_number=generation_number,
+                    generation_count=generation_count,
+                    requested_model=requested_model,
+                    image_config=image_config,
+                    aspect_ratio=aspect_ratio,
+                )
 
-                    # 画像生成
-                    image_config = None
-                    if resolved_aspect_ratio:
-                        image_config = types.ImageConfig(
-                            aspect_ratio=resolved_aspect_ratio,
-                        )
-
-                    def _generate(model_to_use: str):
-                        return client.models.generate_content(
-                            model=model_to_use,
-                        contents=[
-                            types.Part.from_bytes(
-                                data=image_data,
-                                mime_type='image/jpeg'
-                            ),
-                            full_prompt
-                        ],
-                        config=types.GenerateContentConfig(
-                            response_modalities=['IMAGE'],
-                            image_config=image_config,
-                            candidate_count=1,
-                        ),
-                    )
+            # 各生成は独立したAPI呼び出しのため並列に実行する（1枚のみの場合はそのまま実行）
+            generation_numbers = range(1, generation_count + 1)
+            if generation_count <= 1:
+                outcomes = [_generate_nth(n) for n in generation_numbers]
+            else:
+                max_workers = min(cls.MAX_GENERATION_WORKERS, generation_count)
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    outcomes = list(executor.map(_generate_nth, generation_numbers))
 
-                    try:
-                        response = _generate(requested_model)
-                        used_model_this_round = requested_model
-                    except Exception as api_error:
-                        # モデル未許可/未提供の場合はデフォルトモデルへフォールバック（このイテレーションのみ）
-                        if requested_model != cls.DEFAULT_MODEL and "NOT_FOUND" in str(api_error):
-                            logger.warning(
-                                "Model %s not available. Falling back to default %s (iteration %s)",
-                                requested_model,
-                                cls.DEFAULT_MODEL,
-                                i + 1,
-                            )
-                            response = _generate(cls.DEFAULT_MODEL)
-                            used_model_this_round = cls.DEFAULT_MODEL
-                            fallback_count += 1
-                        else:
-                            raise
-
-                    # レスポンスから画像を取得
-                    generated_image_data = None
-                    description = ""
-
-                    for part in response.parts:
-                        if part.text:
-                            description = part.text
-                        if part.inline_data is not None:
-                            generated_image_data = part.inline_data.data
-
-                    if generated_image_data:
-                        results.append({
-                            'image_data': generated_image_data,
-                            'description': description,
-                            'generation_number': i + 1,
-                            'prompt_used': full_prompt,
-                            'aspect_ratio': aspect_ratio,
-                            'model_used': used_model_this_round,
-                        })
-                        logger.info(f"Successfully generated image {i + 1}/{generation_count}")
-                    else:
-                        logger.warning(f"No image data in response for generation {i + 1}")
-
-                except Exception as e:
-                    logger.error(f"Failed to generate image {i + 1}: {str(e)}")
-                    # 一部失敗しても続行
-                    continue
+            results = [result for result, _, _ in outcomes if result is not None]
+            fallback_count = sum(1 for _, fell_back, _ in outcomes if fell_back)
 
             if not results:
-                raise GeminiImageAPIError("画像の生成に失敗しました")
+                # リトライ可否の判定用に、最後に発生したAPIエラーのステータスを引き継ぐ
+                errors = [error for _, _, error in outcomes if error is not None]
+                raise GeminiImageAPIError(
+                    "画像の生成に失敗しました",
+                    status_code=_status_code_of(errors[-1]) if errors else None,
+                )
 
             logger.info(f"Successfully generated {len(results)} images")
 
@@ -334,7 +305,106 @@ class GeminiImageAPIService:
 
         except Exception as e:
             logger.error(f"Image generation failed: {str(e)}")
-            raise GeminiImageAPIError(f"画像生成に失敗しました: {str(e)}")
+            raise GeminiImageAPIError(
+                f"画像生成に失敗しました: {str(e)}",
+                status_code=_status_code_of(e),
+            )
+
+    @classmethod
+    def _generate_one(
+        cls,
+        client: genai.Client,
+        image_data: bytes,
+        prompt: str,
+        generation_number: int,
+        generation_count: int,
+        requested_model: str,
+        image_config,
+        aspect_ratio: str,
+    ) -> Tuple[Dict[str, Any], bool, Exception]:
+        """
+        1枚分の画像を生成
+
+        Returns:
+            (result, fell_back, error)
+            result: 生成結果（失敗・画像なしの場合はNone）
+            fell_back: デフォルトモデルへフォールバックしたかどうか
+            error: 生成に失敗した場合の例外（それ以外はNone）
+        """
+        fell_back = False
+
+        try:
+            # バリエーション用のプロンプト構築
+            full_prompt = cls._build_variation_prompt(prompt, generation_number)
+
+            logger.info(
+                f"Generating image {generation_number}/{generation_count} "
+                f"with prompt: {full_prompt[:100]}..."
+            )
+
+            def _generate(model_to_use: str):
+                return client.models.generate_content(
+                    model=model_to_use,
+                    contents=[
+                        types.Part.from_bytes(
+                            data=image_data,
+                            mime_type='image/jpeg'
+                        ),
+                        full_prompt
+                    ],
+                    config=types.GenerateContentConfig(
+                        response_modalities=['IMAGE'],
+                        image_config=image_config,
+                        candidate_count=1,
+                    ),
+                )
+
+            try:
+                response = _generate(requested_model)
+                used_model_this_round = requested_model
+            except Exception as api_error:
+                # モデル未許可/未提供の場合はデフォルトモデルへフォールバック（このイテレーションのみ）
+                if requested_model != cls.DEFAULT_MODEL and "NOT_FOUND" in str(api_error):
+                    logger.warning(
+                        "Model %s not available. Falling back to default %s (iteration %s)",
+                        requested_model,
+                        cls.DEFAULT_MODEL,
+                        generation_number,
+                    )
+                    response = _generate(cls.DEFAULT_MODEL)
+                    used_model_this_round = cls.DEFAULT_MODEL
+                    fell_back = True
+                else:
+                    raise
+
+            # レスポンスから画像を取得
+            generated_image_data = None
+            description = ""
+
+            for part in response.parts:
+                if part.text:
+                    description = part.text
+                if part.inline_data is not None:
+                    generated_image_data = part.inline_data.data
+
+            if not generated_image_data:
+                logger.warning(f"No image data in response for generation {generation_number}")
+                return None, fell_back, None
+
+            logger.info(f"Successfully generated image {generation_number}/{generation_count}")
+            return {
+                'image_data': generated_image_data,
+                'description': description,
+                'generation_number': generation_number,
+                'prompt_used': full_prompt,
+                'aspect_ratio': aspect_ratio,
+                'model_used': used_model_this_round,
+            }, fell_back, None
+
+        except Exception as e:
+            logger.error(f"Failed to generate image {generation_number}: {str(e)}")
+            # 一部失敗しても続行
+            return None, fell_back, e
 
     @classmethod
     def _build_variation_prompt(cls, user_prompt: str, generation_number: int) -> str:
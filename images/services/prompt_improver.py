@@ -5,8 +5,10 @@ Google Gemini 2.5 Flashを使用して、ユーザー入力プロンプトを
 画像生成に最適化されたプロンプトに改善する。
 """
 
+import functools
+import json
 import logging
-from typing import Optional
+from typing import List, Optional
 from google import genai
 from google.genai import types
 from django.conf import settings
@@ -20,6 +22,22 @@ class PromptImproverError(Exception):
     pass
 
 
+@functools.lru_cache(maxsize=4)
+def _get_client(api_key: str) -> genai.Client:
+    """
+    APIキーごとにGemini APIクライアントを共有する
+
+    クライアント内部の接続プールをリクエスト間で再利用するため、
+    プロセス内で一度だけ生成する（初回リクエスト時に生成され、fork前には作られない）。
+    """
+    client = genai.Client(
+        api_key=api_key,
+        http_options=types.HttpOptions(api_version='v1alpha')
+    )
+    logger.info("Gemini API client initialized successfully")
+    return client
+
+
 class PromptImproverService:
     """
     Gemini 2.5 Flashを使用したプロンプト改善サービス
@@ -59,6 +77,20 @@ class PromptImproverService:
 【スタイル・品質】
 (フォトリアリスティック等のスタイル指定。4K、高画質等の品質タグ)"""
 
+    # 複数件をまとめて改善する場合は、単発用の「プロンプトのみを出力」をJSON配列の出力に置き換える
+    BATCH_SYSTEM_INSTRUCTION = SYSTEM_INSTRUCTION.replace(
+        "- **出力は改善後のプロンプトのみ**: 解説、挨拶、前置きは一切出力しないでください。",
+        "- **出力はJSON配列のみ**: 解説、挨拶、前置き、コードブロックは一切出力しないでください。",
+    ) + """
+
+## 複数入力時の出力形式
+ユーザーからは [1], [2], ... と番号付きで複数のアイデアが渡されます。
+それぞれを上記の出力フォーマットに従って個別に最適化し、
+改善後のプロンプト（改行を含む文字列）を入力と同じ順序・同じ件数で並べた
+JSONの文字列配列として出力してください。
+
+例: ["【主題】\\n...\\n\\n【背景・状況】\\n...", "【主題】\\n..."]"""
+
     def __init__(self, api_key: str):
         """
         Args:
@@ -70,11 +102,7 @@ class PromptImproverService:
     def initialize_client(self) -> None:
         """Gemini APIクライアントを初期化"""
         try:
-            self.client = genai.Client(
-                api_key=self.api_key,
-                http_options=types.HttpOptions(api_version='v1alpha')
-            )
-            logger.info("Gemini API client initialized successfully")
+            self.client = _get_client(self.api_key)
         except Exception as e:
             logger.error(f"Failed to initialize Gemini API client: {e}")
             raise PromptImproverError(f"APIクライアントの初期化に失敗しました: {e}")
@@ -139,6 +167,80 @@ class PromptImproverService:
             logger.error(f"Failed to improve prompt: {e}")
             raise PromptImproverError(f"プロンプトの改善に失敗しました: {e}")
 
+    def improve_prompts(self, user_prompts: List[str]) -> List[str]:
+        """
+        複数のプロンプトを1回のリクエストでまとめて改善する
+
+        応答をJSON配列として受け取り、解析できない場合や件数が一致しない場合は
+        1件ずつ improve_prompt で改善する。
+
+        Args:
+            user_prompts: ユーザーが入力した元のプロンプトのリスト
+
+        Returns:
+            改善されたプロンプトのリスト（入力と同じ順序）
+
+        Raises:
+            PromptImproverError: API呼び出しに失敗した場合
+        """
+        if not user_prompts:
+            return []
+
+        if any(not prompt or not prompt.strip() for prompt in user_prompts):
+            raise PromptImproverError("プロンプトが空です")
+
+        if len(user_prompts) == 1:
+            return [self.improve_prompt(user_prompts[0])]
+
+        if not self.client:
+            self.initialize_client()
+
+        numbered = "\n\n".join(
+            f"[{index}]\n{prompt}" for index, prompt in enumerate(user_prompts, 1)
+        )
+
+        try:
+            logger.info(f"Improving {len(user_prompts)} prompts in one request")
+
+            response = self.client.models.generate_content(
+                model='gemini-2.5-flash',
+                contents=(
+                    f"以下の{len(user_prompts)}件のアイデアをそれぞれ最適化してください:\n\n{numbered}"
+                ),
+                config=types.GenerateContentConfig(
+                    temperature=0.8,
+                    max_output_tokens=min(6000 * len(user_prompts), 65536),
+                    top_p=0.95,
+                    top_k=40,
+                    system_instruction=self.BATCH_SYSTEM_INSTRUCTION,
+                    response_mime_type='application/json',
+                    response_schema=list[str],
+                )
+            )
+        except Exception as e:
+            logger.error(f"Failed to improve prompts: {e}")
+            raise PromptImproverError(f"プロンプトの改善に失敗しました: {e}")
+
+        logger.info(f"Input tokens: {response.usage_metadata.prompt_token_count}")
+        logger.info(f"Output tokens: {response.usage_metadata.candidates_token_count}")
+        logger.info(f"Total tokens: {response.usage_metadata.total_token_count}")
+
+        # JSONとして解析できない（json.JSONDecodeErrorはValueError）・件数が合わない場合のみ1件ずつ改善する
+        try:
+            improved_prompts = json.loads(response.text)
+            if (
+                not isinstance(improved_prompts, list)
+                or len(improved_prompts) != len(user_prompts)
+                or not all(isinstance(p, str) and p.strip() for p in improved_prompts)
+            ):
+                raise ValueError("unexpected batch response shape")
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Batch prompt improvement failed, falling back to per-prompt requests: {e}")
+            return [self.improve_prompt(prompt) for prompt in user_prompts]
+
+        logger.info(f"Successfully improved {len(improved_prompts)} prompts")
+        return [prompt.strip() for prompt in improved_prompts]
+
     def test_connection(self) -> bool:
         """
         APIの接続テスト
@@ -2,13 +2,17 @@
 HotPepper Beautyスクレイピングサービス
 """
 import logging
-import mimetypes
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import ParseResult, urljoin, urlparse
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, FeatureNotFound, SoupStrainer
+from requests.adapters import HTTPAdapter
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 from .upload import ImageUploadService, UploadValidationError
@@ -16,6 +20,22 @@ from .upload import ImageUploadService, UploadValidationError
 
 logger = logging.getLogger(__name__)
 
+# ページ種別とIDプレフィックスの組（style/L..., stylist/T..., blog/bidA...）
+_PAGE_TYPE_RE = re.compile(r"/(?:(?P<style>style)/L|(?P<stylist>stylist)/T|(?P<blog>blog)/bidA)")
+
+
+def _has_class(class_name: str):
+    """
+    SoupStrainer用: class属性に指定クラスを含むか判定する関数を返す
+    """
+    def match(value) -> bool:
+        if not value:
+            return False
+        classes = value.split() if isinstance(value, str) else value
+        return class_name in classes
+
+    return match
+
 
 class ScraperValidationError(Exception):
     """
@@ -35,10 +55,38 @@ class HPBScraperService:
         "Chrome/125.0.0.0 Safari/537.36"
     )
     REQUEST_TIMEOUT = 10
+    # 画像ダウンロードの同時実行数（接続プールサイズと揃える）
+    MAX_DOWNLOAD_WORKERS = 6
+    DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+    # 同一ワーカー内でETag付き画像を再利用するキャッシュ（URL -> (ETag, Content-Type, 本体)）
+    IMAGE_CACHE_MAX_BYTES = 32 * 1024 * 1024
+    _image_cache: "OrderedDict[str, Tuple[str, Optional[str], bytes]]" = OrderedDict()
+    _image_cache_bytes = 0
+    _image_cache_lock = threading.Lock()
+
+    # ページタイプ別に解析対象の要素だけをDOM化する
+    PARSE_STRAINERS = {
+        "style": SoupStrainer("img", attrs={"name": "main"}),
+        "stylist": SoupStrainer("div", class_=_has_class("w245")),
+        "blog": SoupStrainer("dl", class_=_has_class("blogDtlInner")),
+    }
 
     def __init__(self, user_id: int):
         self.user_id = user_id
         self.upload_service = ImageUploadService(user_id=user_id)
+        self.session = self._build_session()
+
+    def _build_session(self) -> requests.Session:
+        """
+        接続を再利用するためのHTTPセッションを生成
+        """
+        session = requests.Session()
+        session.headers["User-Agent"] = self.USER_AGENT
+        adapter = HTTPAdapter(pool_maxsize=self.MAX_DOWNLOAD_WORKERS)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
 
     def scrape_and_upload(self, url: str) -> List[Dict[str, Any]]:
         """
@@ -47,11 +95,7 @@ class HPBScraperService:
         parsed_url, page_type = self._validate_url(url)
 
         try:
-            response = requests.get(
-                url,
-                headers={"User-Agent": self.USER_AGENT},
-                timeout=self.REQUEST_TIMEOUT,
-            )
+            response = self.session.get(url, timeout=self.REQUEST_TIMEOUT)
             response.raise_for_status()
         except requests.RequestException as exc:
             logger.error("HotPepper Beautyページの取得に失敗しました: %s", url, exc_info=exc)
@@ -59,7 +103,7 @@ class HPBScraperService:
                 "ページの読み込みに失敗しました。URLが正しいか確認してください。"
             ) from exc
 
-        soup = BeautifulSoup(response.content, "html.parser")
+        soup = self._parse_html(response.content, page_type)
         base_url = response.url or url
 
         image_urls = self._extract_image_urls(page_type, soup, base_url)
@@ -70,15 +114,6 @@ class HPBScraperService:
         if not uploaded_files:
             raise ScraperValidationError("指定されたURLから画像を見つけることができませんでした。")
 
-        max_files = getattr(self.upload_service, "MAX_FILES_COUNT", 10)
-        if len(uploaded_files) > max_files:
-            logger.info(
-                "ダウンロードした画像が上限を超えたためトリミングします: %s -> %s",
-                len(uploaded_files),
-                max_files,
-            )
-            uploaded_files = uploaded_files[:max_files]
-
         try:
             return self.upload_service.process_uploads(uploaded_files)
         except UploadValidationError as exc:
@@ -104,15 +139,18 @@ class HPBScraperService:
         return parsed, page_type
 
     def _determine_page_type(self, path: str) -> str:
-        segments = [segment for segment in path.split("/") if segment]
-        for idx, segment in enumerate(segments):
-            if segment == "style" and idx + 1 < len(segments) and segments[idx + 1].startswith("L"):
-                return "style"
-            if segment == "stylist" and idx + 1 < len(segments) and segments[idx + 1].startswith("T"):
-                return "stylist"
-            if segment == "blog" and idx + 1 < len(segments) and segments[idx + 1].startswith("bidA"):
-                return "blog"
-        return ""
+        match = _PAGE_TYPE_RE.search(path)
+        return match.lastgroup if match else ""
+
+    def _parse_html(self, content: bytes, page_type: str) -> BeautifulSoup:
+        """
+        HTMLを解析する（lxmlが利用できない場合は html.parser にフォールバック）
+        """
+        strainer = self.PARSE_STRAINERS.get(page_type)
+        try:
+            return BeautifulSoup(content, "lxml", parse_only=strainer)
+        except FeatureNotFound:
+            return BeautifulSoup(content, "html.parser", parse_only=strainer)
 
     def _extract_image_urls(
         self,
@@ -134,14 +172,23 @@ class HPBScraperService:
             return []
 
         image_urls = strategy(soup)
-        normalized_urls = []
+        max_files = self.upload_service.MAX_FILES_COUNT
+        unique_urls: List[str] = []
+        seen = set()
 
+        # 正規化後のURLで重複を除き、アップロード上限数までに絞る
         for image_url in image_urls:
             if not image_url:
                 continue
-            normalized_urls.append(self._normalize_image_url(image_url, base_url))
+            normalized_url = self._normalize_image_url(image_url, base_url)
+            if not normalized_url or normalized_url in seen:
+                continue
+            seen.add(normalized_url)
+            unique_urls.append(normalized_url)
+            if len(unique_urls) >= max_files:
+                break
 
-        return [url for url in normalized_urls if url]
+        return unique_urls
 
     def _normalize_image_url(self, image_url: str, base_url: str) -> str:
         """
@@ -153,10 +200,10 @@ class HPBScraperService:
         return clean_url
 
     def _extract_style_image(self, soup: BeautifulSoup) -> List[str]:
-        target = soup.select_one('img[name="main"]')
-        if not target:
-            return []
-        return [target.get("src")]
+        for node in soup.find_all("img"):
+            if node.get("name") == "main":
+                return [node.get("src")]
+        return []
 
     def _extract_stylist_image(self, soup: BeautifulSoup) -> List[str]:
         target = soup.select_one("div.fl.w245.taC > div > img")
@@ -170,29 +217,111 @@ class HPBScraperService:
 
     def _download_images(self, image_urls: List[str]) -> List[SimpleUploadedFile]:
         """
-        画像URLからデータをダウンロードし SimpleUploadedFile に変換
+        画像URLからデータを並列ダウンロードし SimpleUploadedFile に変換
+
+        結果は image_urls の順序を維持して返す
         """
-        files: List[SimpleUploadedFile] = []
+        if not image_urls:
+            return []
 
-        for index, image_url in enumerate(image_urls):
-            try:
-                response = requests.get(
-                    image_url,
-                    headers={"User-Agent": self.USER_AGENT},
-                    timeout=self.REQUEST_TIMEOUT,
-                )
-                response.raise_for_status()
-            except requests.RequestException as exc:
-                logger.warning("画像のダウンロードに失敗しました: %s", image_url, exc_info=exc)
-                continue
+        downloaded: Dict[int, SimpleUploadedFile] = {}
+        max_workers = min(self.MAX_DOWNLOAD_WORKERS, len(image_urls))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(self._fetch_one, index, image_url): index
+                for index, image_url in enumerate(image_urls)
+            }
+            for future in as_completed(futures):
+                uploaded_file = future.result()
+                if uploaded_file is not None:
+                    downloaded[futures[future]] = uploaded_file
+
+        return [downloaded[index] for index in sorted(downloaded)]
 
-            filename = Path(urlparse(image_url).path).name or f"hpb_image_{index}.jpg"
-            content_type = (
-                response.headers.get("Content-Type")
-                or mimetypes.guess_type(filename)[0]
-                or "image/jpeg"
-            )
+    def _fetch_one(self, index: int, image_url: str) -> Optional[SimpleUploadedFile]:
+        """
+        画像を1件ダウンロードする（失敗時・サイズ超過時は None）
+
+        アップロード上限を超える画像はメモリに載せ切る前に打ち切る。
+        以前に取得したETag付き画像は条件付きGETで再検証し、未更新なら本体を再利用する。
+        """
+        max_size = self.upload_service.MAX_FILE_SIZE
+        cached = self._get_cached_image(image_url)
+        headers = {"If-None-Match": cached[0]} if cached else None
+
+        try:
+            with self.session.get(
+                image_url,
+                headers=headers,
+                timeout=self.REQUEST_TIMEOUT,
+                stream=True,
+            ) as response:
+                if cached and response.status_code == 304:
+                    _, content_type, content = cached
+                else:
+                    response.raise_for_status()
+
+                    content_length = response.headers.get("Content-Length")
+                    if content_length and content_length.isdigit() and int(content_length) > max_size:
+                        logger.warning("画像サイズが上限を超えているためスキップします: %s", image_url)
+                        return None
+
+                    buffer = bytearray()
+                    for chunk in response.iter_content(chunk_size=self.DOWNLOAD_CHUNK_SIZE):
+                        buffer.extend(chunk)
+                        if len(buffer) > max_size:
+                            logger.warning("画像サイズが上限を超えているためスキップします: %s", image_url)
+                            return None
+
+                    content = bytes(buffer)
+                    content_type = response.headers.get("Content-Type")
+                    etag = response.headers.get("ETag")
+                    if etag:
+                        self._store_cached_image(image_url, etag, content_type, content)
+        except requests.RequestException as exc:
+            logger.warning("画像のダウンロードに失敗しました: %s", image_url, exc_info=exc)
+            return None
+
+        filename = Path(urlparse(image_url).path).name or f"hpb_image_{index}.jpg"
+        content_type = (
+            content_type
+            or ImageUploadService.EXT_TO_MIME.get(Path(filename).suffix.lower())
+            or "image/jpeg"
+        )
+
+        return SimpleUploadedFile(filename, content, content_type)
+
+    @classmethod
+    def _get_cached_image(cls, image_url: str) -> Optional[Tuple[str, Optional[str], bytes]]:
+        """
+        キャッシュ済みの画像（ETag, Content-Type, 本体）を取得
+        """
+        with cls._image_cache_lock:
+            cached = cls._image_cache.get(image_url)
+            if cached:
+                cls._image_cache.move_to_end(image_url)
+            return cached
+
+    @classmethod
+    def _store_cached_image(
+        cls,
+        image_url: str,
+        etag: str,
+        content_type: Optional[str],
+        content: bytes,
+    ) -> None:
+        """
+        画像をキャッシュに保存し、上限バイト数を超えた分を古い順に破棄
+        """
+        with cls._image_cache_lock:
+            previous = cls._image_cache.pop(image_url, None)
+            if previous:
+                cls._image_cache_bytes -= len(previous[2])
 
-            files.append(SimpleUploadedFile(filename, response.content, content_type))
+            cls._image_cache[image_url] = (etag, content_type, content)
+            cls._image_cache_bytes += len(content)
 
-        return files
+            while cls._image_cache_bytes > cls.IMAGE_CACHE_MAX_BYTES and cls._image_cache:
+                _, evicted = cls._image_cache.popitem(last=False)
+                cls._image_cache_bytes -= len(evicted[2])
@@ -1,19 +1,17 @@
 """
 画像アップロード処理サービス
 """
+import io
 import os
+import shutil
 import uuid
-import mimetypes
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 from PIL import Image
 from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
 
-# HEIC/HEIF MIME を登録（guess_type 補完用）
-mimetypes.add_type("image/heic", ".heic")
-mimetypes.add_type("image/heif", ".heif")
-
 
 class UploadValidationError(Exception):
     """アップロードバリデーションエラー"""
@@ -39,6 +37,15 @@ class ImageUploadService:
         '.heic',
         '.heif',
     )
+    # 拡張子からMIMEタイプへの対応表
+    EXT_TO_MIME: Dict[str, str] = {
+        '.jpg': 'image/jpeg',
+        '.jpeg': 'image/jpeg',
+        '.png': 'image/png',
+        '.webp': 'image/webp',
+        '.heic': 'image/heic',
+        '.heif': 'image/heif',
+    }
 
     # ファイルサイズ制限（10MB）
     MAX_FILE_SIZE = 10 * 1024 * 1024
@@ -49,6 +56,9 @@ class ImageUploadService:
     # サムネイルサイズ
     THUMBNAIL_SIZE = (300, 300)
 
+    # 複数ファイル処理時の並列数
+    MAX_UPLOAD_WORKERS = 4
+
     def __init__(self, user_id: int):
         """
         初期化
@@ -60,13 +70,16 @@ class ImageUploadService:
         self.user_upload_dir = Path(settings.MEDIA_ROOT) / 'uploads' / str(user_id)
         self.user_upload_dir.mkdir(parents=True, exist_ok=True)
 
-    def validate_file(self, uploaded_file: UploadedFile) -> None:
+    def validate_file(self, uploaded_file: UploadedFile) -> Tuple[bytes, Image.Image]:
         """
         ファイルのバリデーション
 
         Args:
             uploaded_file: アップロードされたファイル
 
+        Returns:
+            (ファイルのバイト列, デコード済み画像)
+
         Raises:
             UploadValidationError: バリデーションエラー
         """
@@ -83,28 +96,26 @@ class ImageUploadService:
                 f'対応していないファイル形式です。対応形式: {", ".join(self.ALLOWED_EXTENSIONS)}'
             )
 
-        # MIMEタイプチェック（緩やかなチェック）
-        mime_type = uploaded_file.content_type
-        # content_typeが不正確な場合もあるので、拡張子で補完
-        guessed_type, _ = mimetypes.guess_type(uploaded_file.name)
-
-        # どちらかが許可されたMIMEタイプであればOK
-        if mime_type not in self.ALLOWED_FORMATS and guessed_type not in self.ALLOWED_FORMATS:
-            # 拡張子が正しければ許可（ブラウザによってcontent_typeが異なる場合があるため）
-            if file_ext not in self.ALLOWED_EXTENSIONS:
-                raise UploadValidationError(
-                    f'対応していないファイル形式です。対応形式: JPEG, PNG, WebP, HEIC/HEIF'
-                )
+        # MIMEタイプチェック（ブラウザによってcontent_typeが異なるため拡張子から判定）
+        if self.EXT_TO_MIME.get(file_ext) not in self.ALLOWED_FORMATS:
+            raise UploadValidationError(
+                f'対応していないファイル形式です。対応形式: JPEG, PNG, WebP, HEIC/HEIF'
+            )
 
-        # 画像ファイルとして開けるか確認
+        # 画像ファイルとしてデコードできるか確認（デコード結果は保存・サムネイル生成で再利用）
         try:
-            img = Image.open(uploaded_file)
-            img.verify()
-            # ファイルポインタをリセット
             uploaded_file.seek(0)
+            file_data = uploaded_file.read()
+            img = Image.open(io.BytesIO(file_data))
+            # 元ファイルはバイト列のまま保存するため、JPEGはサムネイルに十分な縮小スケールでデコード
+            if img.format == 'JPEG':
+                img.draft('RGB', (self.THUMBNAIL_SIZE[0] * 2, self.THUMBNAIL_SIZE[1] * 2))
+            img.load()
         except Exception as e:
             raise UploadValidationError(f'画像ファイルとして読み込めません: {str(e)}')
 
+        return file_data, img
+
     def validate_files_count(self, files_count: int) -> None:
         """
         ファイル数のバリデーション
@@ -135,12 +146,19 @@ class ImageUploadService:
         unique_id = uuid.uuid4().hex
         return f"{unique_id}{file_ext}"
 
-    def save_file(self, uploaded_file: UploadedFile) -> Dict[str, any]:
+    def save_file(
+        self,
+        uploaded_file: UploadedFile,
+        file_data: bytes,
+        image: Image.Image,
+    ) -> Dict[str, any]:
         """
         ファイルを保存
 
         Args:
             uploaded_file: アップロードされたファイル
+            file_data: ファイルのバイト列
+            image: デコード済み画像
 
         Returns:
             保存情報（file_path, file_name, file_size, thumbnail_path）
@@ -153,27 +171,15 @@ class ImageUploadService:
         file_path = self.user_upload_dir / unique_filename
 
         if original_ext in ('.heic', '.heif'):
-            # PILで開いてJPEGへ再エンコード（ブラウザ互換性を確保）
-            uploaded_file.seek(0)
-            with Image.open(uploaded_file) as img:
-                if img.mode in ('RGBA', 'LA', 'P'):
-                    background = Image.new('RGB', img.size, (255, 255, 255))
-                    if img.mode == 'P':
-                        img = img.convert('RGBA')
-                    background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-                    img = background
-                elif img.mode != 'RGB':
-                    img = img.convert('RGB')
-
-                img.save(file_path, 'JPEG', quality=95, optimize=True)
+            # JPEGへ再エンコード（ブラウザ互換性を確保）
+            image = self._to_rgb(image)
+            image.save(file_path, 'JPEG', quality=95, optimize=True)
         else:
             # オリジナル形式のまま保存
-            with open(file_path, 'wb+') as destination:
-                for chunk in uploaded_file.chunks():
-                    destination.write(chunk)
+            self._write_bytes(file_data, file_path)
 
         # サムネイル生成
-        thumbnail_path = self.create_thumbnail(file_path)
+        thumbnail_path = self.create_thumbnail(image, file_path)
 
         # 相対パスを返す（MEDIA_ROOTからの相対パス）
         relative_file_path = f'uploads/{self.user_id}/{unique_filename}'
@@ -186,12 +192,46 @@ class ImageUploadService:
             'thumbnail_path': relative_thumbnail_path,
         }
 
-    def create_thumbnail(self, image_path: Path) -> Path:
+    @staticmethod
+    def _write_bytes(file_data: bytes, file_path: Path) -> None:
+        """
+        バイト列をそのままファイルに書き込む
+
+        Args:
+            file_data: 書き込むデータ
+            file_path: 保存先パス
+        """
+        with open(file_path, 'wb') as destination:
+            destination.write(file_data)
+
+    @staticmethod
+    def _to_rgb(img: Image.Image) -> Image.Image:
+        """
+        JPEG保存用にRGBへ変換（透過部分は白背景で合成）
+
+        Args:
+            img: 変換元画像
+
+        Returns:
+            RGB画像
+        """
+        if img.mode in ('RGBA', 'LA', 'P'):
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
+            return background
+        if img.mode != 'RGB':
+            return img.convert('RGB')
+        return img
+
+    def create_thumbnail(self, image: Image.Image, image_path: Path) -> Path:
         """
         サムネイル画像を生成
 
         Args:
-            image_path: 元画像のパス
+            image: デコード済みの元画像
+            image_path: 元画像の保存パス
 
         Returns:
             サムネイル画像のパス
@@ -204,27 +244,59 @@ class ImageUploadService:
         thumbnail_filename = f"thumb_{image_path.stem}.jpg"
         thumbnail_path = thumbnail_dir / thumbnail_filename
 
-        # サムネイル生成
-        with Image.open(image_path) as img:
-            # RGBA画像の場合はRGBに変換
-            if img.mode in ('RGBA', 'LA', 'P'):
-                # 白背景を作成
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-
-            # アスペクト比を維持してリサイズ
-            img.thumbnail(self.THUMBNAIL_SIZE, Image.Resampling.LANCZOS)
-
-            # サムネイル保存（JPEG形式）
-            img.save(thumbnail_path, 'JPEG', quality=85, optimize=True)
+        fits_thumbnail = (
+            image.width <= self.THUMBNAIL_SIZE[0]
+            and image.height <= self.THUMBNAIL_SIZE[1]
+        )
+
+        # 既にサムネイルサイズ以下のRGB JPEGは再エンコードせずにコピー
+        if fits_thumbnail and image.mode == 'RGB' and image_path.suffix.lower() in ('.jpg', '.jpeg'):
+            shutil.copyfile(image_path, thumbnail_path)
+            return thumbnail_path
+
+        # RGBA画像などはRGBに変換
+        img = self._to_rgb(image)
+
+        # アスペクト比を維持してリサイズ
+        if not fits_thumbnail:
+            img.thumbnail(self.THUMBNAIL_SIZE, Image.Resampling.BILINEAR)
+
+        # サムネイル保存（JPEG形式）
+        img.save(thumbnail_path, 'JPEG', quality=85)
 
         return thumbnail_path
 
+    def _process_one(self, uploaded_file: UploadedFile) -> Dict[str, Dict[str, any]]:
+        """
+        1ファイル分のバリデーション・保存処理
+
+        Args:
+            uploaded_file: アップロードされたファイル
+
+        Returns:
+            成功時は {'ok': 保存情報}、失敗時は {'err': エラー情報}
+        """
+        try:
+            # バリデーション（デコード済み画像を以降の処理で再利用）
+            file_data, image = self.validate_file(uploaded_file)
+
+            # ファイル保存
+            try:
+                return {'ok': self.save_file(uploaded_file, file_data, image)}
+            finally:
+                image.close()
+
+        except UploadValidationError as e:
+            return {'err': {
+                'filename': uploaded_file.name,
+                'error': str(e)
+            }}
+        except Exception as e:
+            return {'err': {
+                'filename': uploaded_file.name,
+                'error': f'予期しないエラーが発生しました: {str(e)}'
+            }}
+
     def process_uploads(self, uploaded_files: List[UploadedFile]) -> List[Dict[str, any]]:
         """
         複数ファイルのアップロード処理
@@ -241,28 +313,16 @@ class ImageUploadService:
         # ファイル数チェック
         self.validate_files_count(len(uploaded_files))
 
-        results = []
-        errors = []
+        # 1件のみの場合はスレッドプールを使わずに処理
+        if len(uploaded_files) <= 1:
+            outcomes = [self._process_one(uploaded_file) for uploaded_file in uploaded_files]
+        else:
+            max_workers = min(self.MAX_UPLOAD_WORKERS, len(uploaded_files))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                outcomes = list(executor.map(self._process_one, uploaded_files))
 
-        for uploaded_file in uploaded_files:
-            try:
-                # バリデーション
-                self.validate_file(uploaded_file)
-
-                # ファイル保存
-                file_info = self.save_file(uploaded_file)
-                results.append(file_info)
-
-            except UploadValidationError as e:
-                errors.append({
-                    'filename': uploaded_file.name,
-                    'error': str(e)
-                })
-            except Exception as e:
-                errors.append({
-                    'filename': uploaded_file.name,
-                    'error': f'予期しないエラーが発生しました: {str(e)}'
-                })
+        results = [outcome['ok'] for outcome in outcomes if 'ok' in outcome]
+        errors = [outcome['err'] for outcome in outcomes if 'err' in outcome]
 
         if errors:
             # エラーがある場合は例外を投げる
@@ -5,10 +5,11 @@ imagesアプリのDjangoシグナル
 """
 
 import logging
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
 
+from accounts.models import UserProfile
 from images.models import PromptPreset, ImageConversion
 
 
@@ -20,17 +21,14 @@ logger = logging.getLogger(__name__)
 def clear_prompt_cache(sender, instance, **kwargs):
     """
     PromptPresetの保存・削除時にプロンプト関連のキャッシュをクリア
+
+    ロールバック時にキャッシュを消さないよう、コミット後に実行する。
     """
     try:
-        # 全カテゴリのキャッシュをクリア
-        cache.delete('prompts_list:all')
-        cache.delete('prompts_categories')
-
-        # 各カテゴリのキャッシュもクリア
-        for category_value, _ in PromptPreset.CATEGORY_CHOICES:
-            cache.delete(f'prompts_list:{category_value}')
+        # 全カテゴリ・各カテゴリのキャッシュをまとめて無効化
+        transaction.on_commit(PromptPreset.invalidate_cache)
 
-        logger.info(f"Cleared prompt cache after {instance} changed")
+        logger.info(f"Scheduled prompt cache invalidation after {instance} changed")
     except Exception as e:
         logger.error(f"Error clearing prompt cache: {str(e)}")
 
@@ -40,17 +38,15 @@ def clear_prompt_cache(sender, instance, **kwargs):
 def clear_usage_cache(sender, instance, **kwargs):
     """
     ImageConversionの保存・削除時に利用状況キャッシュをクリア
+
+    ロールバック時にキャッシュを消さないよう、コミット後に実行する。
     """
     try:
         user_id = instance.user_id
 
-        # 該当ユーザーの利用状況キャッシュをクリア
-        cache.delete(f'usage_summary:{user_id}')
-
-        # 利用履歴キャッシュもクリア（1-12ヶ月分）
-        for months in range(1, 13):
-            cache.delete(f'usage_history:{user_id}:{months}')
+        # 該当ユーザーの利用状況・利用履歴キャッシュを無効化
+        transaction.on_commit(lambda: UserProfile.invalidate_usage_cache_for(user_id))
 
-        logger.info(f"Cleared usage cache for user {user_id} after ImageConversion changed")
+        logger.info(f"Scheduled usage cache invalidation for user {user_id} after ImageConversion changed")
     except Exception as e:
         logger.error(f"Error clearing usage cache: {str(e)}")
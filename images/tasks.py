@@ -9,12 +9,14 @@ import os
 import time
 import logging
 import uuid
-from typing import Dict, Any
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, Iterable, List
 from decimal import Decimal
 
 from celery import shared_task
 from django.conf import settings
-from django.db import transaction
+from django.db import connection, transaction
 from django.db.models import F, Value
 from django.db.models.functions import Greatest
 from django.core.cache import cache
@@ -27,37 +29,271 @@ from .services.gemini_image_api import GeminiImageAPIService, GeminiImageAPIErro
 
 logger = logging.getLogger(__name__)
 
+# チャネルレイヤーと同期送信ラッパーはプロセス内で共有する（タスク毎の取得・ラッパー生成を避ける）。
+# チャネルレイヤー未設定の環境では通知を送らない。
+CHANNEL_LAYER = get_channel_layer()
+_direct_send = async_to_sync(CHANNEL_LAYER.send) if CHANNEL_LAYER is not None else None
+_group_send = async_to_sync(CHANNEL_LAYER.group_send) if CHANNEL_LAYER is not None else None
+
 MODEL_MULTIPLIERS = {
     'gemini-2.5-flash-image': 1,
     'gemini-3-pro-image-preview': 5,
 }
 
 
+# 進捗通知の間引き条件（前回送信から一定以上進んだか、一定時間経過した場合のみ送信）
+PROGRESS_MIN_DELTA = 5
+PROGRESS_MIN_INTERVAL = 0.5
+
+# 自動リトライ対象の例外（GeminiImageAPIErrorは429/5xxの場合のみ再送出してリトライさせる）
+RETRYABLE_ERRORS = (GeminiImageAPIError, ConnectionError, TimeoutError)
+
+# 生成画像のファイル保存を並列実行する最大スレッド数
+SAVE_MAX_WORKERS = 8
+
+
 class ConversionCancelledError(Exception):
     """Raised when a conversion has been cancelled by the user."""
 
 
 def _ensure_not_cancelled(conversion: ImageConversion) -> None:
-    """Reload conversion status and abort if it has been cancelled."""
+    """Abort if the cancel flag for this conversion has been set in the cache."""
+
+    if ImageConversion.is_cancel_flagged(conversion.id):
+        raise ConversionCancelledError(f"Conversion {conversion.id} has been cancelled")
+
+
+def _ensure_not_cancelled_in_db(conversion: ImageConversion) -> None:
+    """Reload conversion status from the database and abort if it has been cancelled."""
 
     conversion.refresh_from_db(fields=['status'])
     if conversion.status == 'cancelled':
         raise ConversionCancelledError(f"Conversion {conversion.id} has been cancelled")
 
 
+def _conversion_group(conversion_id: int) -> str:
+    """Return the channel group name that progress consumers of a conversion join."""
+
+    return f'conversion_{conversion_id}'
+
+
+def _send_message(conversion_id: int, message: Dict[str, Any]) -> None:
+    """Send one message to the conversion's group."""
+
+    if CHANNEL_LAYER is None:
+        return
+
+    _group_send(_conversion_group(conversion_id), message)
+
+
+def _send_to_subscriber(conversion_id: int, message: Dict[str, Any]) -> None:
+    """Send directly to the only subscribed channel when known, otherwise to the whole group."""
+
+    if CHANNEL_LAYER is None:
+        return
+
+    channel_name = ImageConversion.get_single_channel_name(conversion_id)
+    if channel_name:
+        _direct_send(channel_name, message)
+    else:
+        _group_send(_conversion_group(conversion_id), message)
+
+
+def _flush_progress(conversion_id: int, messages: List[Dict[str, Any]]) -> None:
+    """Send several messages to the group through a single async_to_sync bridge, in order."""
+
+    if not messages or CHANNEL_LAYER is None:
+        return
+
+    conversion_group = _conversion_group(conversion_id)
+
+    async def _send_all():
+        for message in messages:
+            await CHANNEL_LAYER.group_send(conversion_group, message)
+
+    async_to_sync(_send_all)()
+
+
+def _maybe_send_progress(
+    conversion_id: int,
+    state: Dict[str, float],
+    message: Dict[str, Any],
+) -> bool:
+    """Send a progress message only when it moved enough or enough time has passed since the last one."""
+
+    now = time.monotonic()
+    if (
+        message['progress'] - state['progress'] < PROGRESS_MIN_DELTA
+        and now - state['sent_at'] < PROGRESS_MIN_INTERVAL
+    ):
+        return False
+
+    # 途中経過は取りこぼしても完了通知で補えるため、送信失敗で変換処理を止めない
+    try:
+        _send_message(conversion_id, message)
+    except Exception as error:
+        logger.warning("Failed to send progress for conversion %s: %s", conversion_id, error)
+        return False
+
+    state['progress'] = message['progress']
+    state['sent_at'] = now
+    return True
+
+
+def _release_db_connection() -> None:
+    """Close the worker's DB connection before a long external call; the ORM reconnects on next use."""
+
+    # 呼び出し元のトランザクション内（テストやeager実行）では接続を閉じない
+    if connection.in_atomic_block:
+        return
+    connection.close()
+
+
 def _remove_file_if_exists(path: str) -> None:
     """Remove a file from disk if it exists."""
 
     if not path:
         return
     try:
-        if os.path.exists(path):
-            os.remove(path)
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
     except OSError as error:
         logger.warning("Failed to remove file %s: %s", path, error)
 
 
-@shared_task(bind=True, max_retries=3)
+def _discard_saved_results(saved_results: Iterable[Dict[str, Any]]) -> None:
+    """Remove the files written so far and any GeneratedImage rows already created for them."""
+
+    saved_results = list(saved_results)
+    for saved in saved_results:
+        _remove_file_if_exists(saved.get('file_path'))
+
+    created_ids = [saved['instance'].id for saved in saved_results if saved.get('instance')]
+    if created_ids:
+        try:
+            GeneratedImage.objects.filter(id__in=created_ids).delete()
+        except Exception as delete_error:
+            logger.warning(
+                "Failed to delete GeneratedImages %s during cleanup: %s",
+                created_ids,
+                delete_error,
+            )
+
+
+def _fail_and_rollback(conversion_id: int, error_msg: str) -> None:
+    """Mark the conversion as failed, give back its consumed usage and notify the group."""
+
+    try:
+        # 利用数の返却と失敗ステータスへの更新は1トランザクションでまとめてコミットする
+        with transaction.atomic():
+            conversion = (
+                ImageConversion.objects.select_for_update(of=('self',))
+                .select_related('user__profile')
+                .get(id=conversion_id)
+            )
+            try:
+                # 返却に失敗しても失敗ステータスへの更新は行えるよう、セーブポイント内で実行する
+                with transaction.atomic():
+                    profile = conversion.user.profile
+                    profile_model = profile.__class__
+                    updated = profile_model.objects.filter(pk=profile.pk).update(
+                        monthly_used=Greatest(
+                            F('monthly_used') - conversion.usage_consumed,
+                            Value(0),
+                        )
+                    )
+                    if not updated:
+                        raise ValueError("No rows updated during usage rollback")
+                logger.info(
+                    "Rolled back usage for user %s by %s",
+                    profile.user_id,
+                    conversion.usage_consumed,
+                )
+            except Exception as rollback_error:
+                logger.error(
+                    "Failed to rollback usage count for conversion %s: %s",
+                    conversion_id,
+                    rollback_error,
+                )
+            # 利用状況キャッシュは保存時のシグナルでコミット後に無効化される
+            conversion.mark_as_failed(error_msg)
+    except Exception as update_error:
+        logger.error(f"Failed to update conversion status: {update_error}")
+
+    # 失敗通知
+    _send_message(
+        conversion_id,
+        {
+            'type': 'conversion_failed',
+            'message': '画像変換に失敗しました',
+            'error': error_msg
+        }
+    )
+
+
+def _save_generated_result(result: Dict[str, Any], output_dir: str, media_root: str) -> Dict[str, Any]:
+    """Write one generated image to disk and return its path/size metadata."""
+
+    filename = f"{uuid.uuid4().hex}.jpg"
+
+    try:
+        relative_path, file_size = GeminiImageAPIService.save_generated_image(
+            image_data=result['image_data'],
+            output_dir=output_dir,
+            filename=filename
+        )
+    except Exception:
+        _remove_file_if_exists(os.path.join(media_root, output_dir, filename))
+        raise
+
+    return {
+        'filename': filename,
+        'relative_path': relative_path,
+        'file_path': os.path.join(media_root, relative_path),
+        'file_size': file_size,
+    }
+
+
+def _iter_saved_results(generated_results: List[Dict[str, Any]], output_dir: str, media_root: str):
+    """Yield (index, saved) for each image written to disk, in completion order; failed writes are logged and skipped."""
+
+    # 1枚のみの場合はスレッドプールを使わずにそのまま保存する
+    if len(generated_results) == 1:
+        try:
+            yield 1, _save_generated_result(generated_results[0], output_dir, media_root)
+        except Exception as e:
+            logger.error(f"Failed to save image 1: {str(e)}")
+        return
+
+    # ファイル書き込みはI/O待ちが支配的なためスレッドで並列化する。
+    # キャンセル判定は呼び出し側で全ファイルの書き込み完了後に行い、書きかけのファイルを取りこぼさないようにする。
+    max_workers = min(SAVE_MAX_WORKERS, len(generated_results))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_save_generated_result, result, output_dir, media_root): idx
+            for idx, result in enumerate(generated_results, 1)
+        }
+
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                saved = future.result()
+            except Exception as e:
+                logger.error(f"Failed to save image {idx}: {str(e)}")
+                # 一部失敗しても続行
+                continue
+            yield idx, saved
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=RETRYABLE_ERRORS,
+    retry_backoff=True,
+    retry_backoff_max=30,
+    retry_jitter=True,
+    max_retries=3,
+)
 def process_image_conversion(self, conversion_id: int) -> Dict[str, Any]:
     """
     画像変換処理タスク
@@ -70,19 +306,37 @@ def process_image_conversion(self, conversion_id: int) -> Dict[str, Any]:
     """
     logger.info(f"Starting image conversion task for ID: {conversion_id}")
 
-    start_time = time.time()
-    channel_layer = get_channel_layer()
-    conversion_group = f'conversion_{conversion_id}'
+    start_time = time.monotonic()
     conversion = None
-    saved_records = []
+    # 生成番号ごとの保存結果（キャンセル時の後片付けにも使う）
+    saved_by_index = {}
 
     try:
+        # 重複配信などで既に終了・キャンセル済みの場合は、行ロックを取らずに抜ける
+        current_status = (
+            ImageConversion.objects.filter(id=conversion_id)
+            .values_list('status', flat=True)
+            .first()
+        )
+        if current_status == 'cancelled':
+            raise ConversionCancelledError(f"Conversion {conversion_id} has been cancelled")
+        if current_status in ('completed', 'failed'):
+            logger.info(
+                "Conversion %s already finished with status %s. Skipping.",
+                conversion_id,
+                current_status,
+            )
+            return {
+                'status': current_status,
+                'message': 'Conversion already finished before processing task.',
+            }
+
         with transaction.atomic():
             conversion = (
-                ImageConversion.objects.select_for_update()
+                ImageConversion.objects.select_for_update(of=('self',))
+                .select_related('user__profile')
                 .get(id=conversion_id)
             )
-            saved_records = []
 
             if conversion.status == 'cancelled':
                 raise ConversionCancelledError(
@@ -103,14 +357,16 @@ def process_image_conversion(self, conversion_id: int) -> Dict[str, Any]:
             if conversion.status != 'processing':
                 conversion.mark_as_processing()
 
-            # 前回のフォールバック通知をクリア
-            cache.delete(f"conversion_fallback_{conversion.id}")
+        # 前回のフォールバック通知をクリア
+        cache.delete(f"conversion_fallback_{conversion.id}")
 
         _ensure_not_cancelled(conversion)
 
-        # 進捗通知: 開始
-        async_to_sync(channel_layer.group_send)(
-            conversion_group,
+        # 元画像のパス
+        original_image_path = conversion.original_image_path
+
+        # 進捗通知: 開始・API呼び出し前（まとめて送信）
+        _flush_progress(conversion_id, [
             {
                 'type': 'conversion_progress',
                 'message': '画像変換を開始しています...',
@@ -118,15 +374,7 @@ def process_image_conversion(self, conversion_id: int) -> Dict[str, Any]:
                 'status': 'processing',
                 'current': 0,
                 'total': conversion.generation_count
-            }
-        )
-
-        # 元画像のパス
-        original_image_path = conversion.original_image_path
-
-        # 進捗通知: API呼び出し前
-        async_to_sync(channel_layer.group_send)(
-            conversion_group,
+            },
             {
                 'type': 'conversion_progress',
                 'message': 'AI画像生成中...',
@@ -134,15 +382,19 @@ def process_image_conversion(self, conversion_id: int) -> Dict[str, Any]:
                 'status': 'processing',
                 'current': 0,
                 'total': conversion.generation_count
-            }
-        )
+            },
+        ])
 
         # Gemini 2.5 Flash Imageで画像生成
         logger.info(f"Calling Gemini Image API with prompt: {conversion.prompt[:100]}...")
 
         _ensure_not_cancelled(conversion)
 
+        # API呼び出し中（数秒〜数分）にDB接続を保持し続けないよう一旦解放する
+        _release_db_connection()
+
         requested_model = conversion.model_name
+        pending_messages = []
 
         generated_results, model_used = GeminiImageAPIService.generate_images_from_reference(
             original_image_path=original_image_path,
@@ -154,58 +406,59 @@ def process_image_conversion(self, conversion_id: int) -> Dict[str, Any]:
 
         _ensure_not_cancelled(conversion)
 
-        # 実際に使用されたモデルごとの内訳を集計（部分的フォールバック対応）
-        used_models = [
-            result.get('model_used') or model_used or requested_model
+        # フォールバックが発生した場合のみ、実際に使用されたモデルごとの内訳を集計（部分的フォールバック対応）
+        fallback_present = any(
+            (result.get('model_used') or model_used or requested_model) != requested_model
             for result in generated_results
-        ]
-        model_usage_counts: Dict[str, int] = {}
-        for m in used_models:
-            model_usage_counts[m] = model_usage_counts.get(m, 0) + 1
-
-        actual_cost = sum(MODEL_MULTIPLIERS.get(m, 1) for m in used_models)
-        fallback_present = any(m != requested_model for m in used_models)
+        )
 
         if fallback_present:
+            used_models = [
+                result.get('model_used') or model_used or requested_model
+                for result in generated_results
+            ]
+            model_usage_counts: Dict[str, int] = dict(Counter(used_models))
+            actual_cost = sum(
+                count * MODEL_MULTIPLIERS.get(m, 1) for m, count in model_usage_counts.items()
+            )
             actual_models = set(used_models)
             effective_model = used_models[0] if len(actual_models) == 1 else requested_model
             used_model_label = effective_model if len(actual_models) == 1 else 'mixed'
             refund = max(0, conversion.usage_consumed - actual_cost)
 
-            # usage_consumed と必要なら model_name を補正
-            update_fields = ['usage_consumed', 'updated_at']
-            conversion.usage_consumed = actual_cost
-            if len(actual_models) == 1 and effective_model != conversion.model_name:
-                conversion.model_name = effective_model
-                update_fields.append('model_name')
-            conversion.save(update_fields=update_fields)
-
-            # クレジット返却
-            if refund > 0:
-                try:
-                    profile = conversion.user.profile
-                    profile_model = profile.__class__
-                    updated = profile_model.objects.filter(pk=profile.pk).update(
-                        monthly_used=Greatest(
-                            F('monthly_used') - refund,
-                            Value(0),
+            # usage_consumed の補正とクレジット返却をまとめてコミットする
+            # （利用状況キャッシュはImageConversion保存時のシグナルでコミット後に一度だけ無効化される）
+            with transaction.atomic():
+                # usage_consumed と必要なら model_name を補正
+                update_fields = ['usage_consumed', 'updated_at']
+                conversion.usage_consumed = actual_cost
+                if len(actual_models) == 1 and effective_model != conversion.model_name:
+                    conversion.model_name = effective_model
+                    update_fields.append('model_name')
+                conversion.save(update_fields=update_fields)
+
+                # クレジット返却
+                if refund > 0:
+                    try:
+                        with transaction.atomic():
+                            profile = conversion.user.profile
+                            profile.__class__.objects.filter(pk=profile.pk).update(
+                                monthly_used=Greatest(
+                                    F('monthly_used') - refund,
+                                    Value(0),
+                                )
+                            )
+                        logger.info(
+                            "Adjusted usage after partial fallback: refund=%s, actual_cost=%s, models=%s",
+                            refund,
+                            actual_cost,
+                            model_usage_counts,
+                        )
+                    except Exception as refund_error:
+                        logger.error(
+                            "Failed to adjust usage after partial fallback: %s",
+                            refund_error,
                         )
-                    )
-                    if updated:
-                        profile.refresh_from_db(fields=['monthly_used'])
-                        if hasattr(profile, "invalidate_usage_cache"):
-                            profile.invalidate_usage_cache()
-                    logger.info(
-                        "Adjusted usage after partial fallback: refund=%s, actual_cost=%s, models=%s",
-                        refund,
-                        actual_cost,
-                        model_usage_counts,
-                    )
-                except Exception as refund_error:
-                    logger.error(
-                        "Failed to adjust usage after partial fallback: %s",
-                        refund_error,
-                    )
 
             fallback_payload = {
                 'fallback': True,
@@ -216,17 +469,14 @@ def process_image_conversion(self, conversion_id: int) -> Dict[str, Any]:
                 'model_breakdown': model_usage_counts,
             }
 
-            # WebSocket通知
-            async_to_sync(channel_layer.group_send)(
-                conversion_group,
-                {
-                    'type': 'conversion_progress',
-                    'message': f"{requested_model} が利用できなかったため別モデルで生成しました。消費クレジットを再計算しています。",
-                    'progress': 35,
-                    'status': 'processing',
-                    **fallback_payload,
-                }
-            )
+            # WebSocket通知（保存開始の通知とまとめて送信）
+            pending_messages.append({
+                'type': 'conversion_progress',
+                'message': f"{requested_model} が利用できなかったため別モデルで生成しました。消費クレジットを再計算しています。",
+                'progress': 35,
+                'status': 'processing',
+                **fallback_payload,
+            })
 
             # ポーリング用にキャッシュへ記録（1時間保持）
             cache.set(
@@ -238,107 +488,97 @@ def process_image_conversion(self, conversion_id: int) -> Dict[str, Any]:
         logger.info(f"Generated {len(generated_results)} images")
 
         # 進捗通知: 画像保存中
-        async_to_sync(channel_layer.group_send)(
-            conversion_group,
-            {
-                'type': 'conversion_progress',
-                'message': '生成画像を保存中...',
-                'progress': 70,
-                'status': 'processing',
-                'current': 0,
-                'total': conversion.generation_count
-            }
-        )
-
-        # 生成画像を保存
-        saved_images = []
-
-        for idx, result in enumerate(generated_results, 1):
-            _ensure_not_cancelled(conversion)
-
-            filename = f"{uuid.uuid4()}.jpg"
-            output_dir = f"generated/user_{conversion.user.id}"
-
-            relative_path = None
-            file_path = None
-
-            try:
-                _ensure_not_cancelled(conversion)
-                relative_path = GeminiImageAPIService.save_generated_image(
-                    image_data=result['image_data'],
-                    output_dir=output_dir,
-                    filename=filename
-                )
-
-                file_path = os.path.join(settings.MEDIA_ROOT, relative_path)
-
-                _ensure_not_cancelled(conversion)
+        pending_messages.append({
+            'type': 'conversion_progress',
+            'message': '生成画像を保存中...',
+            'progress': 70,
+            'status': 'processing',
+            'current': 0,
+            'total': conversion.generation_count
+        })
+        _flush_progress(conversion_id, pending_messages)
+
+        # 生成画像をファイルに保存（DBレコードは後でまとめて作成）
+        progress_state = {'progress': 70, 'sent_at': time.monotonic()}
+
+        # 保存先はループ前に一度だけ決める（user_idはFKの列値のためJOIN不要）
+        user_id = conversion.user_id
+        output_dir = f"generated/user_{user_id}"
+        media_root = settings.MEDIA_ROOT
+        total = len(generated_results)
 
-                file_size = os.path.getsize(file_path)
+        _ensure_not_cancelled(conversion)
 
-                _ensure_not_cancelled(conversion)
+        for idx, saved in _iter_saved_results(generated_results, output_dir, media_root):
+            saved_by_index[idx] = saved
 
-                generated_image = GeneratedImage.objects.create(
-                    conversion=conversion,
-                    image_path=relative_path,
-                    image_name=filename,
-                    image_size=file_size
-                )
+            logger.info(
+                "Saved image %s/%s: %s",
+                idx,
+                total,
+                saved['relative_path'],
+            )
 
-                saved_records.append({
-                    'instance': generated_image,
-                    'file_path': file_path,
-                })
+            # 最後の1枚（1枚のみの場合を含む）は直後に完了通知を送るため途中経過は省く
+            done = len(saved_by_index)
+            if done == total:
+                continue
 
-                saved_images.append({
-                    'id': generated_image.id,
-                    'url': f"/media/{relative_path}",
-                    'name': filename,
-                    'description': result.get('description', ''),
-                })
+            # 進捗通知: 画像保存進捗（70%から90%の間で更新、細かい更新は間引く）
+            progress = 70 + int((done / total) * 20)
+            _maybe_send_progress(
+                conversion_id,
+                progress_state,
+                {
+                    'type': 'conversion_progress',
+                    'message': f'生成画像を保存中... ({done}/{total})',
+                    'progress': progress,
+                    'status': 'processing',
+                    'current': done,
+                    'total': total
+                }
+            )
 
-                logger.info(
-                    "Saved image %s/%s: %s",
-                    idx,
-                    len(generated_results),
-                    relative_path,
-                )
+        _ensure_not_cancelled(conversion)
 
-                # 進捗通知: 画像保存進捗（70%から90%の間で更新）
-                progress = 70 + int((idx / len(generated_results)) * 20)
-                async_to_sync(channel_layer.group_send)(
-                    conversion_group,
-                    {
-                        'type': 'conversion_progress',
-                        'message': f'生成画像を保存中... ({idx}/{len(generated_results)})',
-                        'progress': progress,
-                        'status': 'processing',
-                        'current': idx,
-                        'total': len(generated_results)
-                    }
-                )
+        # 生成順を保ったままレコードを組み立てる
+        saved_indices = sorted(saved_by_index)
+        if not saved_indices:
+            raise GeminiImageAPIError("画像の保存に失敗しました")
 
-            except ConversionCancelledError:
-                if file_path:
-                    _remove_file_if_exists(file_path)
-                elif relative_path:
-                    _remove_file_if_exists(os.path.join(settings.MEDIA_ROOT, relative_path))
-                raise
-            except Exception as e:
-                logger.error(f"Failed to save image {idx}: {str(e)}")
-                _remove_file_if_exists(file_path)
-                # 一部失敗しても続行
-                continue
+        # 生成画像レコードを一括作成
+        with transaction.atomic():
+            created_images = GeneratedImage.objects.bulk_create(
+                [
+                    GeneratedImage(
+                        conversion=conversion,
+                        image_path=saved_by_index[idx]['relative_path'],
+                        image_name=saved_by_index[idx]['filename'],
+                        image_size=saved_by_index[idx]['file_size'],
+                    )
+                    for idx in saved_indices
+                ],
+                batch_size=100,
+            )
 
-        _ensure_not_cancelled(conversion)
+        for idx, generated_image in zip(saved_indices, created_images):
+            saved_by_index[idx]['instance'] = generated_image
 
-        if not saved_images:
-            raise GeminiImageAPIError("画像の保存に失敗しました")
+        saved_images = [
+            {
+                'id': generated_image.id,
+                'url': f"/media/{generated_image.image_path}",
+                'name': generated_image.image_name,
+                'description': generated_results[idx - 1].get('description', ''),
+            }
+            for idx, generated_image in zip(saved_indices, created_images)
+        ]
 
         # 処理時間計算
-        processing_time = Decimal(str(time.time() - start_time))
+        processing_time = Decimal(f"{time.monotonic() - start_time:.3f}")
 
-        _ensure_not_cancelled(conversion)
+        # 完了前にDBのステータスで最終確認
+        _ensure_not_cancelled_in_db(conversion)
 
         # ステータスを完了に更新
         conversion.mark_as_completed(processing_time)
@@ -352,9 +592,9 @@ def process_image_conversion(self, conversion_id: int) -> Dict[str, Any]:
         else:
             completion_message = '画像変換が完了しました！'
 
-        # 進捗通知: 完了
-        async_to_sync(channel_layer.group_send)(
-            conversion_group,
+        # 進捗通知: 完了（画像一覧を含み大きいため、購読者が1接続なら直接送信する）
+        _send_to_subscriber(
+            conversion.id,
             {
                 'type': 'conversion_completed',
                 'message': completion_message,
@@ -380,18 +620,7 @@ def process_image_conversion(self, conversion_id: int) -> Dict[str, Any]:
     except ConversionCancelledError:
         logger.info("Conversion %s cancelled. Cleaning up partial results.", conversion_id)
 
-        for record in saved_records:
-            _remove_file_if_exists(record.get('file_path'))
-            image_instance = record.get('instance')
-            if image_instance:
-                try:
-                    image_instance.delete()
-                except Exception as delete_error:
-                    logger.warning(
-                        "Failed to delete GeneratedImage %s during cancel cleanup: %s",
-                        getattr(image_instance, 'id', 'unknown'),
-                        delete_error,
-                    )
+        _discard_saved_results(saved_by_index.values())
 
         if conversion is None:
             try:
@@ -404,8 +633,8 @@ def process_image_conversion(self, conversion_id: int) -> Dict[str, Any]:
             if conversion.status != 'cancelled':
                 conversion.mark_as_cancelled()
 
-        async_to_sync(channel_layer.group_send)(
-            conversion_group,
+        _send_message(
+            conversion_id,
             {
                 'type': 'conversion_cancelled',
                 'message': '画像変換はキャンセルされました'
@@ -423,47 +652,15 @@ def process_image_conversion(self, conversion_id: int) -> Dict[str, Any]:
         error_msg = str(e)
         logger.error(f"Gemini API error for conversion {conversion_id}: {error_msg}")
 
-        # ステータスを失敗に更新
-        try:
-            conversion = ImageConversion.objects.get(id=conversion_id)
-            try:
-                profile = conversion.user.profile
-                profile_model = profile.__class__
-                updated = profile_model.objects.filter(pk=profile.pk).update(
-                    monthly_used=Greatest(
-                        F('monthly_used') - conversion.usage_consumed,
-                        Value(0),
-                    )
-                )
-                if not updated:
-                    raise ValueError("No rows updated during usage rollback")
-                profile.refresh_from_db(fields=['monthly_used'])
-                if hasattr(profile, "invalidate_usage_cache"):
-                    profile.invalidate_usage_cache()
-                logger.info(
-                    "Rolled back usage for user %s by %s",
-                    profile.user_id,
-                    conversion.usage_consumed,
-                )
-            except Exception as rollback_error:
-                logger.error(
-                    "Failed to rollback usage count for conversion %s: %s",
-                    conversion_id,
-                    rollback_error,
-                )
-            conversion.mark_as_failed(error_msg)
-        except Exception as update_error:
-            logger.error(f"Failed to update conversion status: {update_error}")
+        # 保存済みのファイルとレコードはリトライ・失敗のどちらでも残さない
+        _discard_saved_results(saved_by_index.values())
 
-        # 失敗通知
-        async_to_sync(channel_layer.group_send)(
-            conversion_group,
-            {
-                'type': 'conversion_failed',
-                'message': '画像変換に失敗しました',
-                'error': error_msg
-            }
-        )
+        # レート制限・サーバーエラーのみ、指数バックオフ＋ジッターでリトライ（autoretry_for）
+        if e.retryable and self.request.retries < self.max_retries:
+            logger.info(f"Retrying task (attempt {self.request.retries + 1})")
+            raise
+
+        _fail_and_rollback(conversion_id, error_msg)
 
         return {'status': 'error', 'message': error_msg}
 
@@ -471,51 +668,15 @@ def process_image_conversion(self, conversion_id: int) -> Dict[str, Any]:
         error_msg = f"Unexpected error: {str(e)}"
         logger.exception(f"Unexpected error for conversion {conversion_id}")
 
-        # リトライ
-        if self.request.retries < self.max_retries:
+        # 保存済みのファイルとレコードはリトライ・失敗のどちらでも残さない
+        _discard_saved_results(saved_by_index.values())
+
+        # 一時的な通信エラーのみ、指数バックオフ＋ジッターでリトライ（autoretry_for）
+        if isinstance(e, RETRYABLE_ERRORS) and self.request.retries < self.max_retries:
             logger.info(f"Retrying task (attempt {self.request.retries + 1})")
-            raise self.retry(exc=e, countdown=60)  # 60秒後にリトライ
+            raise
 
         # 最大リトライ回数を超えた場合
-        try:
-            conversion = ImageConversion.objects.get(id=conversion_id)
-            try:
-                profile = conversion.user.profile
-                profile_model = profile.__class__
-                updated = profile_model.objects.filter(pk=profile.pk).update(
-                    monthly_used=Greatest(
-                        F('monthly_used') - conversion.usage_consumed,
-                        Value(0),
-                    )
-                )
-                if not updated:
-                    raise ValueError("No rows updated during usage rollback")
-                profile.refresh_from_db(fields=['monthly_used'])
-                if hasattr(profile, "invalidate_usage_cache"):
-                    profile.invalidate_usage_cache()
-                logger.info(
-                    "Rolled back usage for user %s by %s",
-                    profile.user_id,
-                    conversion.usage_consumed,
-                )
-            except Exception as rollback_error:
-                logger.error(
-                    "Failed to rollback usage count for conversion %s: %s",
-                    conversion_id,
-                    rollback_error,
-                )
-            conversion.mark_as_failed(error_msg)
-        except Exception as update_error:
-            logger.error(f"Failed to update conversion status: {update_error}")
-
-        # 失敗通知
-        async_to_sync(channel_layer.group_send)(
-            conversion_group,
-            {
-                'type': 'conversion_failed',
-                'message': '画像変換に失敗しました',
-                'error': error_msg
-            }
-        )
+        _fail_and_rollback(conversion_id, error_msg)
 
         return {'status': 'error', 'message': error_msg}
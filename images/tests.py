@@ -1,45 +1,53 @@
+import asyncio
 import io
+import json
 import os
 import shutil
-import tempfile
 
+from concurrent.futures import wait
 from datetime import timedelta
+from pathlib import Path
 from types import SimpleNamespace
 from unittest.mock import patch
 
+import requests
+from asgiref.sync import async_to_sync
+from google.genai import errors as genai_errors
+from channels.layers import InMemoryChannelLayer
 from PIL import Image
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.management import call_command
-from django.test import TestCase, override_settings
+from django.db import DatabaseError
+from django.test import TestCase
 from django.utils import timezone
 
+from config.test_utils import TempMediaRootMixin
+from images.management.commands.delete_expired_images import Command as DeleteExpiredImagesCommand
 from images.services.upload import ImageUploadService, UploadValidationError
 from images.services.brightness import BrightnessAdjustmentService, BrightnessAdjustmentError
 from images.services.gemini_image_api import GeminiImageAPIService, GeminiImageAPIError
+from images.services.scraper import HPBScraperService
+from images.services.prompt_improver import PromptImproverService, PromptImproverError
 from images.models import ImageConversion, GeneratedImage
+from images.tasks import ConversionCancelledError, process_image_conversion
 
+# テスト入力のJPEGは事前にエンコードしてリポジトリに同梱し、実行時は読み込むだけにする
+TESTDATA_DIR = Path(__file__).resolve().parent / 'testdata'
+UPLOAD_JPEG = (TESTDATA_DIR / 'upload_8x8.jpg').read_bytes()
+LARGE_JPEG = (TESTDATA_DIR / 'large_1600x1200.jpg').read_bytes()
 
-class ImageUploadServiceTests(TestCase):
+
+class ImageUploadServiceTests(TempMediaRootMixin, TestCase):
     """
     ImageUploadService の振る舞いを検証するテスト
     """
 
-    def setUp(self):
-        self.temp_media = tempfile.mkdtemp()
-        self.override = override_settings(MEDIA_ROOT=self.temp_media)
-        self.override.enable()
-
-    def tearDown(self):
-        self.override.disable()
-        shutil.rmtree(self.temp_media, ignore_errors=True)
+    clear_media_after_each_test = True
 
     def _make_image_file(self, name='upload.jpg'):
-        buffer = io.BytesIO()
-        image = Image.new('RGB', (128, 128), color=(100, 150, 200))
-        image.save(buffer, format='JPEG')
-        buffer.seek(0)
-        return SimpleUploadedFile(name, buffer.read(), content_type='image/jpeg')
+        return SimpleUploadedFile(name, UPLOAD_JPEG, content_type='image/jpeg')
 
     def test_process_uploads_saves_file_and_thumbnail(self):
         """
@@ -58,6 +66,40 @@ class ImageUploadServiceTests(TestCase):
         self.assertTrue(os.path.exists(file_path))
         self.assertTrue(os.path.exists(thumb_path))
 
+    def test_process_uploads_thumbnail_fits_bounds_for_large_jpeg(self):
+        """
+        大きなJPEGでもサムネイルはアスペクト比を保って上限サイズに収まる
+        """
+        large_file = SimpleUploadedFile('large.jpg', LARGE_JPEG, content_type='image/jpeg')
+
+        service = ImageUploadService(user_id=1)
+        stored = service.process_uploads([large_file])[0]
+
+        with Image.open(os.path.join(self.temp_media, stored['thumbnail_path'])) as thumb:
+            self.assertEqual(thumb.size, (300, 225))
+        self.assertEqual(stored['file_size'], len(LARGE_JPEG))
+
+    def test_process_uploads_keeps_order_for_multiple_files(self):
+        """
+        複数ファイルは並列処理されても入力順で結果が返る
+        """
+        service = ImageUploadService(user_id=1)
+        names = [f'upload_{index}.jpg' for index in range(4)]
+        result = service.process_uploads([self._make_image_file(name) for name in names])
+
+        self.assertEqual([stored['file_name'] for stored in result], names)
+
+    def test_process_uploads_copies_small_jpeg_as_thumbnail(self):
+        """
+        サムネイルサイズ以下のJPEGは再エンコードせずそのままサムネイルになる
+        """
+        service = ImageUploadService(user_id=1)
+        stored = service.process_uploads([self._make_image_file()])[0]
+
+        with open(os.path.join(self.temp_media, stored['file_path']), 'rb') as original, \
+                open(os.path.join(self.temp_media, stored['thumbnail_path']), 'rb') as thumb:
+            self.assertEqual(original.read(), thumb.read())
+
     def test_process_uploads_raises_on_invalid_extension(self):
         """
         不正な拡張子の場合は UploadValidationError が発生する
@@ -73,25 +115,148 @@ class ImageUploadServiceTests(TestCase):
             service.process_uploads([invalid_file])
 
 
-class BrightnessAdjustmentServiceTests(TestCase):
+class HPBScraperServiceTests(TempMediaRootMixin, TestCase):
+    """
+    HPBScraperService の検証
+    """
+
+    def setUp(self):
+        HPBScraperService._image_cache.clear()
+        HPBScraperService._image_cache_bytes = 0
+
+    @staticmethod
+    def _make_response(body, headers=None):
+        response = requests.Response()
+        response.status_code = 200
+        response.headers.update(headers or {'Content-Type': 'image/jpeg'})
+        response.raw = io.BytesIO(body)
+        return response
+
+    def test_download_images_preserves_order_and_skips_failures(self):
+        """
+        並列ダウンロードでも元のURL順を維持し、失敗した画像は除外される
+        """
+        def fake_get(url, **kwargs):
+            if url.endswith('broken.jpg'):
+                raise requests.ConnectionError('boom')
+            return self._make_response(url.encode())
+
+        service = HPBScraperService(user_id=1)
+        urls = [f'https://imgbp.hotp.jp/img/{index}.jpg' for index in range(5)]
+        urls.insert(2, 'https://imgbp.hotp.jp/img/broken.jpg')
+
+        with patch.object(service.session, 'get', side_effect=fake_get):
+            files = service._download_images(urls)
+
+        self.assertEqual([f.name for f in files], [f'{index}.jpg' for index in range(5)])
+
+    def test_determine_page_type(self):
+        """
+        パスからページ種別を判定する（種別とIDプレフィックスの組が一致する場合のみ）
+        """
+        service = HPBScraperService(user_id=1)
+        cases = {
+            '/slnH000123456/style/L001234567.html': 'style',
+            '/slnH000123456/stylist/T000987654/': 'stylist',
+            '/slnH000123456/blog/bidA012345678.html': 'blog',
+            '/slnH000123456/style/T000987654/': '',
+            '/slnH000123456/stylist/L001234567.html': '',
+            '/slnH000123456/blog/': '',
+            '/slnH000123456/mystyle/L001234567.html': '',
+            '/slnH000123456/': '',
+        }
+        for path, expected in cases.items():
+            self.assertEqual(service._determine_page_type(path), expected, path)
+
+    def test_extract_image_urls_from_strained_html(self):
+        """
+        ページタイプ別に絞り込んだDOMから画像URLを抽出できる
+        """
+        html = (
+            b'<html><body>'
+            b'<img name="main" src="/style/main.jpg?impolicy=x">'
+            b'<div class="fl w245 taC"><div><img src="/stylist/face.jpg"></div></div>'
+            b'<dl class="blogDtlInner"><dt>title</dt><dd><p>'
+            b'<img src="/blog/a.jpg"><img src="/blog/b.jpg"></p></dd></dl>'
+            b'</body></html>'
+        )
+        base_url = 'https://beauty.hotpepper.jp/slnH000000000/'
+        service = HPBScraperService(user_id=1)
+
+        expected = {
+            'style': ['https://beauty.hotpepper.jp/style/main.jpg'],
+            'stylist': ['https://beauty.hotpepper.jp/stylist/face.jpg'],
+            'blog': [
+                'https://beauty.hotpepper.jp/blog/a.jpg',
+                'https://beauty.hotpepper.jp/blog/b.jpg',
+            ],
+        }
+        for page_type, urls in expected.items():
+            soup = service._parse_html(html, page_type)
+            self.assertEqual(service._extract_image_urls(page_type, soup, base_url), urls)
+
+    def test_extract_image_urls_deduplicates_and_limits(self):
+        """
+        重複URLは1件にまとめ、アップロード上限数までに絞り込む
+        """
+        images = ''.join(
+            f'<img src="/blog/{index}.jpg?size={index}"><img src="/blog/{index}.jpg">'
+            for index in range(15)
+        )
+        html = f'<dl class="blogDtlInner"><dd>{images}</dd></dl>'.encode()
+        service = HPBScraperService(user_id=1)
+        soup = service._parse_html(html, 'blog')
+
+        urls = service._extract_image_urls('blog', soup, 'https://beauty.hotpepper.jp/')
+
+        self.assertEqual(
+            urls,
+            [f'https://beauty.hotpepper.jp/blog/{index}.jpg' for index in range(ImageUploadService.MAX_FILES_COUNT)],
+        )
+
+    def test_download_images_reuses_cached_body_on_not_modified(self):
+        """
+        ETag付きで取得済みの画像は 304 応答時にキャッシュから再利用される
+        """
+        url = 'https://imgbp.hotp.jp/img/etag.jpg'
+        first = self._make_response(b'cached-body', {'Content-Type': 'image/jpeg', 'ETag': '"v1"'})
+        not_modified = self._make_response(b'')
+        not_modified.status_code = 304
+
+        service = HPBScraperService(user_id=1)
+        with patch.object(service.session, 'get', side_effect=[first, not_modified]) as mock_get:
+            service._download_images([url])
+            files = service._download_images([url])
+
+        self.assertEqual(mock_get.call_args.kwargs['headers'], {'If-None-Match': '"v1"'})
+        self.assertEqual(files[0].read(), b'cached-body')
+
+    def test_download_images_skips_oversized_body(self):
+        """
+        アップロード上限を超える画像はダウンロード途中で打ち切られる
+        """
+        service = HPBScraperService(user_id=1)
+        oversized = self._make_response(b'x' * (ImageUploadService.MAX_FILE_SIZE + 1))
+
+        with patch.object(service.session, 'get', return_value=oversized):
+            files = service._download_images(['https://imgbp.hotp.jp/img/huge.jpg'])
+
+        self.assertEqual(files, [])
+
+
+class BrightnessAdjustmentServiceTests(TempMediaRootMixin, TestCase):
     """
     BrightnessAdjustmentService の検証
     """
 
+    clear_media_after_each_test = True
+
     def setUp(self):
-        self.temp_media = tempfile.mkdtemp()
-        self.override = override_settings(MEDIA_ROOT=self.temp_media)
-        self.override.enable()
         self.image_path = os.path.join('generated', 'source.jpg')
         full_path = os.path.join(self.temp_media, self.image_path)
         os.makedirs(os.path.dirname(full_path), exist_ok=True)
 
-        with Image.new('RGB', (64, 64), color=(120, 120, 120)) as img:
-            img.save(full_path, format='JPEG')
-
-    def tearDown(self):
-        self.override.disable()
-        shutil.rmtree(self.temp_media, ignore_errors=True)
+        shutil.copyfile(TESTDATA_DIR / 'source_gray_8x8.jpg', full_path)
 
     def test_adjust_brightness_creates_adjusted_file(self):
         """
@@ -112,9 +277,10 @@ class BrightnessAdjustmentServiceTests(TestCase):
 
 
 class ImageModelTests(TestCase):
-    def setUp(self):
-        self.User = get_user_model()
-        self.user = self.User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.User = get_user_model()
+        cls.user = cls.User.objects.create_user(
             username='image_tester', email='img@example.com', password='secret123'
         )
 
@@ -132,18 +298,56 @@ class ImageModelTests(TestCase):
         self.assertEqual(conversion.job_id, f'job_{conversion.id}')
 
         conversion.mark_as_processing()
-        conversion.refresh_from_db()
         self.assertEqual(conversion.status, 'processing')
 
         conversion.mark_as_completed(processing_time=1.23)
-        conversion.refresh_from_db()
         self.assertEqual(conversion.status, 'completed')
 
         conversion.mark_as_failed('error')
-        conversion.refresh_from_db()
         self.assertEqual(conversion.status, 'failed')
         self.assertEqual(conversion.error_message, 'error')
 
+        # 永続化は最後の状態だけを1回のSELECTで確認する
+        stored = ImageConversion.objects.get(pk=conversion.pk)
+        self.assertEqual(stored.status, 'failed')
+        self.assertEqual(stored.error_message, 'error')
+
+    def test_finishing_clears_cancel_flag(self):
+        conversion = ImageConversion.objects.create(
+            user=self.user,
+            original_image_path='uploads/path.jpg',
+            original_image_name='path.jpg',
+            original_image_size=1234,
+            prompt='test',
+            generation_count=1,
+            aspect_ratio='4:3',
+        )
+        cache.set(ImageConversion.cancel_flag_key(conversion.id), 1, 60)
+
+        conversion.mark_as_failed('error')
+
+        self.assertFalse(ImageConversion.is_cancel_flagged(conversion.id))
+
+    def test_usage_cache_invalidated_after_commit(self):
+        summary_key = f'usage_summary:{self.user.id}'
+        cache.set(summary_key, {'dummy': True}, 60)
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            ImageConversion.objects.create(
+                user=self.user,
+                original_image_path='uploads/path.jpg',
+                original_image_name='path.jpg',
+                original_image_size=1234,
+                prompt='test',
+                generation_count=1,
+                aspect_ratio='4:3',
+            )
+
+        self.assertIsNotNone(cache.get(summary_key))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(summary_key))
+
     def test_generated_image_auto_expires(self):
         conversion = ImageConversion.objects.create(
             user=self.user,
@@ -166,22 +370,17 @@ class ImageModelTests(TestCase):
         self.assertFalse(image.is_expired)
 
 
-class DeleteExpiredImagesCommandTests(TestCase):
-    def setUp(self):
-        self.temp_media = tempfile.mkdtemp()
-        self.override = override_settings(MEDIA_ROOT=self.temp_media)
-        self.override.enable()
+class DeleteExpiredImagesCommandTests(TempMediaRootMixin, TestCase):
+    clear_media_after_each_test = True
 
-        self.User = get_user_model()
-        self.user = self.User.objects.create_user(
+    @classmethod
+    def setUpTestData(cls):
+        cls.User = get_user_model()
+        cls.user = cls.User.objects.create_user(
             username='cleanup', email='cleanup@example.com', password='secret123'
         )
 
-    def tearDown(self):
-        self.override.disable()
-        shutil.rmtree(self.temp_media, ignore_errors=True)
-
-    def test_delete_expired_images_command_force(self):
+    def _create_expired_image(self):
         conversion = ImageConversion.objects.create(
             user=self.user,
             original_image_path='uploads/original.jpg',
@@ -195,8 +394,9 @@ class DeleteExpiredImagesCommandTests(TestCase):
         expired_path = os.path.join('generated', 'expired.jpg')
         full_path = os.path.join(self.temp_media, expired_path)
         os.makedirs(os.path.dirname(full_path), exist_ok=True)
-        with Image.new('RGB', (32, 32), color=(200, 200, 200)) as img:
-            img.save(full_path, format='JPEG')
+        # コマンドはファイルの中身を読まないため、最小のJPEGマーカーだけ書き込む
+        with open(full_path, 'wb') as f:
+            f.write(b'\xff\xd8\xff\xd9')
 
         GeneratedImage.objects.create(
             conversion=conversion,
@@ -206,38 +406,522 @@ class DeleteExpiredImagesCommandTests(TestCase):
             expires_at=timezone.now() - timedelta(days=1),
             is_deleted=False,
         )
+        return full_path
+
+    def test_delete_expired_images_command_force(self):
+        full_path = self._create_expired_image()
 
-        call_command('delete_expired_images', '--force')
+        # 引数解析を経由せずにコマンド本体を直接呼び出す
+        DeleteExpiredImagesCommand(stdout=io.StringIO()).handle(force=True, verbosity=0)
 
         self.assertFalse(os.path.exists(full_path))
         self.assertFalse(GeneratedImage.objects.filter(image_name='expired.jpg').exists())
 
+    def test_delete_expired_images_command_without_force_keeps_files(self):
+        full_path = self._create_expired_image()
+
+        out = io.StringIO()
+        call_command('delete_expired_images', stdout=out)
+
+        self.assertIn('--force', out.getvalue())
+        self.assertTrue(os.path.exists(full_path))
+        self.assertTrue(GeneratedImage.objects.filter(image_name='expired.jpg').exists())
+
 
 class GeminiImageServiceTests(TestCase):
-    @patch('images.services.gemini_image_api.GeminiImageAPIService.load_image', return_value=b'input-bytes')
-    @patch('images.services.gemini_image_api.GeminiImageAPIService.initialize_client')
-    def test_generate_images_success(self, mock_client_factory, mock_load):
-        mock_response = SimpleNamespace(parts=[
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # 応答オブジェクトはテスト中に変更されないため、クラスで1回だけ組み立てる
+        cls.mock_response = SimpleNamespace(parts=[
             SimpleNamespace(text='desc', inline_data=SimpleNamespace(data=b'\xff\xd8\xff\xd9'))
         ])
-        mock_client_factory.return_value = SimpleNamespace(
-            models=SimpleNamespace(generate_content=lambda **kwargs: mock_response)
-        )
+
+    def setUp(self):
+        # 呼び出し内容は検証しないため、MagicMockを使わずクラス属性を直接差し替える
+        originals = {
+            name: GeminiImageAPIService.__dict__[name]
+            for name in ('load_image', 'initialize_client')
+        }
+
+        def restore():
+            for name, value in originals.items():
+                setattr(GeminiImageAPIService, name, value)
+
+        self.addCleanup(restore)
+        GeminiImageAPIService.load_image = staticmethod(lambda *args, **kwargs: b'input-bytes')
+
+    @staticmethod
+    def _use_generate_content(generate_content):
+        client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+        GeminiImageAPIService.initialize_client = staticmethod(lambda *args, **kwargs: client)
+
+    def test_generate_images_success(self):
+        self._use_generate_content(lambda **kwargs: self.mock_response)
 
         results, model_used = GeminiImageAPIService.generate_images_from_reference('path.jpg', 'prompt', generation_count=1)
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0]['description'], 'desc')
         self.assertEqual(model_used, GeminiImageAPIService.DEFAULT_MODEL)
 
-    @patch('images.services.gemini_image_api.GeminiImageAPIService.load_image', return_value=b'input-bytes')
-    @patch('images.services.gemini_image_api.GeminiImageAPIService.initialize_client')
-    def test_generate_images_raises_on_failure(self, mock_client_factory, mock_load):
+    def test_generate_images_raises_on_failure(self):
         def failing_generate_content(**kwargs):
             raise RuntimeError('API failure')
 
-        mock_client_factory.return_value = SimpleNamespace(
-            models=SimpleNamespace(generate_content=failing_generate_content)
-        )
+        self._use_generate_content(failing_generate_content)
 
         with self.assertRaises(GeminiImageAPIError):
             GeminiImageAPIService.generate_images_from_reference('path.jpg', 'prompt', generation_count=1)
+
+    def test_generate_multiple_images_keeps_order_and_skips_failures(self):
+        def generate_content(**kwargs):
+            prompt = kwargs['contents'][1]
+            if 'バリエーション2' in prompt:
+                raise RuntimeError('API failure')
+            return SimpleNamespace(parts=[
+                SimpleNamespace(text=None, inline_data=SimpleNamespace(data=b'\xff\xd8\xff\xd9'))
+            ])
+
+        self._use_generate_content(generate_content)
+
+        results, _ = GeminiImageAPIService.generate_images_from_reference('path.jpg', 'prompt', generation_count=4)
+        self.assertEqual([r['generation_number'] for r in results], [1, 3, 4])
+
+    def test_genai_api_errors_map_to_retryable_status(self):
+        cases = [
+            (genai_errors.ClientError(429, {'error': {'code': 429, 'status': 'RESOURCE_EXHAUSTED'}}), 429, True),
+            (genai_errors.ServerError(503, {'error': {'code': 503, 'status': 'UNAVAILABLE'}}), 503, True),
+            (genai_errors.ClientError(400, {'error': {'code': 400, 'status': 'INVALID_ARGUMENT'}}), 400, False),
+        ]
+        for api_error, status_code, retryable in cases:
+            with self.subTest(status_code=status_code):
+                def failing_generate_content(**kwargs):
+                    raise api_error
+
+                self._use_generate_content(failing_generate_content)
+
+                with self.assertRaises(GeminiImageAPIError) as ctx:
+                    GeminiImageAPIService.generate_images_from_reference('path.jpg', 'prompt', generation_count=2)
+                self.assertEqual(ctx.exception.status_code, status_code)
+                self.assertEqual(ctx.exception.retryable, retryable)
+
+
+class PromptImproverServiceTests(TestCase):
+    USAGE = SimpleNamespace(prompt_token_count=0, candidates_token_count=0, total_token_count=0)
+
+    @staticmethod
+    def _service(generate_content):
+        service = PromptImproverService(api_key='test-key')
+        service.client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+        return service
+
+    def test_improve_prompts_uses_single_request(self):
+        calls = []
+
+        def generate_content(**kwargs):
+            calls.append(kwargs)
+            return SimpleNamespace(
+                text=json.dumps([' improved a ', 'improved b']), usage_metadata=self.USAGE
+            )
+
+        improved = self._service(generate_content).improve_prompts(['a', 'b'])
+
+        self.assertEqual(improved, ['improved a', 'improved b'])
+        self.assertEqual(len(calls), 1)
+        config = calls[0]['config']
+        self.assertEqual(config.system_instruction, PromptImproverService.BATCH_SYSTEM_INSTRUCTION)
+        self.assertEqual(config.response_mime_type, 'application/json')
+
+    def test_improve_prompts_falls_back_per_prompt_on_parse_error(self):
+        calls = []
+
+        def generate_content(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                return SimpleNamespace(text='not json', usage_metadata=self.USAGE)
+            return SimpleNamespace(text=f'improved {len(calls)}', usage_metadata=self.USAGE)
+
+        improved = self._service(generate_content).improve_prompts(['a', 'b'])
+
+        self.assertEqual(improved, ['improved 2', 'improved 3'])
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(
+            [call['config'].system_instruction for call in calls[1:]],
+            [PromptImproverService.SYSTEM_INSTRUCTION] * 2,
+        )
+
+    def test_improve_prompts_falls_back_when_count_mismatches(self):
+        calls = []
+
+        def generate_content(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                return SimpleNamespace(text=json.dumps(['only one']), usage_metadata=self.USAGE)
+            return SimpleNamespace(text=f'improved {len(calls)}', usage_metadata=self.USAGE)
+
+        improved = self._service(generate_content).improve_prompts(['a', 'b'])
+
+        self.assertEqual(improved, ['improved 2', 'improved 3'])
+        self.assertEqual(len(calls), 3)
+
+    def test_improve_prompts_raises_on_api_error_without_fallback(self):
+        calls = []
+
+        def generate_content(**kwargs):
+            calls.append(kwargs)
+            raise RuntimeError('quota exceeded')
+
+        with self.assertRaises(PromptImproverError):
+            self._service(generate_content).improve_prompts(['a', 'b'])
+        self.assertEqual(len(calls), 1)
+
+
+class ProcessImageConversionTaskTests(TempMediaRootMixin, TestCase):
+    clear_media_after_each_test = True
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            username='task_tester', email='task@example.com', password='secret123'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _create_conversion(self, generation_count=3):
+        return ImageConversion.objects.create(
+            user=self.user,
+            original_image_path='uploads/original.jpg',
+            original_image_name='original.jpg',
+            original_image_size=100,
+            prompt='prompt',
+            generation_count=generation_count,
+            usage_consumed=generation_count,
+            aspect_ratio='4:3',
+        )
+
+    @staticmethod
+    def _generated_results(count):
+        return [
+            {
+                'image_data': b'\xff\xd8\xff\xd9',
+                'description': f'desc {index}',
+                'generation_number': index,
+                'model_used': GeminiImageAPIService.DEFAULT_MODEL,
+            }
+            for index in range(1, count + 1)
+        ]
+
+    def _run_with_channel_layer(self, conversion, layer):
+        # 設定のレイヤー（Redis等）に残った過去のメッセージを拾わないよう、専用のインメモリレイヤーを使う
+        with patch.multiple(
+            'images.tasks',
+            CHANNEL_LAYER=layer,
+            _direct_send=async_to_sync(layer.send),
+            _group_send=async_to_sync(layer.group_send),
+        ):
+            return process_image_conversion.apply(args=(conversion.id,)).get()
+
+    @staticmethod
+    def _receive_until_completed(layer, channel_name):
+        # 完了通知が届かない退行でテストが止まらないよう、受信ごとにタイムアウトを設ける
+        async def receive():
+            return await asyncio.wait_for(layer.receive(channel_name), timeout=1)
+
+        messages = []
+        while not messages or messages[-1]['type'] != 'conversion_completed':
+            messages.append(async_to_sync(receive)())
+        return messages
+
+    @patch('images.tasks.GeminiImageAPIService.generate_images_from_reference')
+    def test_saves_all_generated_images(self, mock_generate):
+        conversion = self._create_conversion(generation_count=3)
+        mock_generate.return_value = (self._generated_results(3), GeminiImageAPIService.DEFAULT_MODEL)
+
+        result = process_image_conversion.apply(args=(conversion.id,)).get()
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['images_count'], 3)
+
+        conversion.refresh_from_db()
+        self.assertEqual(conversion.status, 'completed')
+
+        images = list(conversion.generated_images.all())
+        self.assertEqual(len(images), 3)
+        for image in images:
+            self.assertTrue(image.image_path.startswith(f'generated/user_{self.user.id}/'))
+            self.assertEqual(image.image_size, 4)
+            self.assertTrue(os.path.exists(os.path.join(self.temp_media, image.image_path)))
+
+    @patch('images.tasks.GeminiImageAPIService.generate_images_from_reference')
+    def test_records_follow_generation_order_when_saves_finish_out_of_order(self, mock_generate):
+        conversion = self._create_conversion(generation_count=3)
+        results = self._generated_results(3)
+        for result in results:
+            # サイズで生成番号を識別できるようにする
+            result['image_data'] = b'x' * result['generation_number']
+        mock_generate.return_value = (results, GeminiImageAPIService.DEFAULT_MODEL)
+
+        def reverse_generation_order(futures):
+            # 後の生成番号ほど先に書き込みが終わったことにする
+            wait(futures)
+            return sorted(futures, key=futures.get, reverse=True)
+
+        layer = InMemoryChannelLayer()
+        async_to_sync(layer.group_add)(f'conversion_{conversion.id}', 'conversion.member')
+        with patch('images.tasks.as_completed', side_effect=reverse_generation_order):
+            self._run_with_channel_layer(conversion, layer)
+
+        images = self._receive_until_completed(layer, 'conversion.member')[-1]['images']
+        self.assertEqual([image['description'] for image in images], ['desc 1', 'desc 2', 'desc 3'])
+        for number, image in enumerate(images, 1):
+            self.assertEqual(GeneratedImage.objects.get(id=image['id']).image_size, number)
+
+    @patch('images.tasks.GeminiImageAPIService.generate_images_from_reference')
+    def test_bulk_create_failure_removes_saved_files(self, mock_generate):
+        conversion = self._create_conversion(generation_count=2)
+        mock_generate.return_value = (self._generated_results(2), GeminiImageAPIService.DEFAULT_MODEL)
+
+        with patch.object(GeneratedImage.objects, 'bulk_create', side_effect=DatabaseError('insert failed')):
+            result = process_image_conversion.apply(args=(conversion.id,)).get()
+
+        self.assertEqual(result['status'], 'error')
+        conversion.refresh_from_db()
+        self.assertEqual(conversion.status, 'failed')
+        output_dir = os.path.join(self.temp_media, f'generated/user_{self.user.id}')
+        self.assertEqual(os.listdir(output_dir), [])
+
+    @patch('images.tasks.GeminiImageAPIService.generate_images_from_reference')
+    def test_retried_bulk_create_failure_leaves_no_orphaned_files(self, mock_generate):
+        conversion = self._create_conversion(generation_count=2)
+        mock_generate.return_value = (self._generated_results(2), GeminiImageAPIService.DEFAULT_MODEL)
+        bulk_create = GeneratedImage.objects.bulk_create
+        calls = []
+
+        def flaky_bulk_create(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise ConnectionError('connection reset')
+            return bulk_create(*args, **kwargs)
+
+        with patch.object(GeneratedImage.objects, 'bulk_create', side_effect=flaky_bulk_create):
+            result = process_image_conversion.apply(args=(conversion.id,)).get()
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(len(calls), 2)
+        output_dir = os.path.join(self.temp_media, f'generated/user_{self.user.id}')
+        self.assertCountEqual(
+            os.listdir(output_dir),
+            GeneratedImage.objects.filter(conversion=conversion).values_list('image_name', flat=True),
+        )
+
+    @patch('images.tasks.GeminiImageAPIService.generate_images_from_reference')
+    def test_cancel_flag_stops_processing(self, mock_generate):
+        conversion = self._create_conversion(generation_count=2)
+
+        def cancel_during_generation(**kwargs):
+            ImageConversion.objects.filter(pk=conversion.pk).update(status='cancelled')
+            cache.set(ImageConversion.cancel_flag_key(conversion.id), 1, 60)
+            return self._generated_results(2), GeminiImageAPIService.DEFAULT_MODEL
+
+        mock_generate.side_effect = cancel_during_generation
+
+        result = process_image_conversion.apply(args=(conversion.id,)).get()
+
+        self.assertEqual(result['status'], 'cancelled')
+        conversion.refresh_from_db()
+        self.assertEqual(conversion.status, 'cancelled')
+        self.assertFalse(conversion.generated_images.exists())
+
+    @patch('images.tasks.GeminiImageAPIService.generate_images_from_reference')
+    def test_api_error_marks_failed_and_rolls_back_usage(self, mock_generate):
+        conversion = self._create_conversion(generation_count=2)
+        profile = self.user.profile
+        profile.monthly_used = 5
+        profile.save()
+        mock_generate.side_effect = GeminiImageAPIError('boom')
+
+        result = process_image_conversion.apply(args=(conversion.id,)).get()
+
+        self.assertEqual(result['status'], 'error')
+        conversion.refresh_from_db()
+        self.assertEqual(conversion.status, 'failed')
+        self.assertEqual(conversion.error_message, 'boom')
+        profile.refresh_from_db()
+        self.assertEqual(profile.monthly_used, 3)
+        self.assertEqual(mock_generate.call_count, 1)
+
+    @patch('images.tasks.GeminiImageAPIService.generate_images_from_reference')
+    def test_api_error_invalidates_usage_cache_after_commit(self, mock_generate):
+        conversion = self._create_conversion(generation_count=1)
+        summary_key = f'usage_summary:{self.user.id}'
+        mock_generate.side_effect = GeminiImageAPIError('boom')
+
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            cache.set(summary_key, {'dummy': True}, 60)
+            process_image_conversion.apply(args=(conversion.id,)).get()
+
+        self.assertIsNotNone(cache.get(summary_key))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(cache.get(summary_key))
+
+    @patch('images.tasks.GeminiImageAPIService.generate_images_from_reference')
+    def test_rate_limited_api_error_is_retried(self, mock_generate):
+        conversion = self._create_conversion(generation_count=1)
+        mock_generate.side_effect = [
+            GeminiImageAPIError('rate limited', status_code=429),
+            (self._generated_results(1), GeminiImageAPIService.DEFAULT_MODEL),
+        ]
+
+        result = process_image_conversion.apply(args=(conversion.id,)).get()
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(mock_generate.call_count, 2)
+        conversion.refresh_from_db()
+        self.assertEqual(conversion.status, 'completed')
+
+    def _run_with_genai_errors(self, conversion, first_error, later_error=None):
+        """
+        Gemini クライアントだけを差し替え、genaiの例外がサービス層のステータス変換を経て
+        タスクの再試行判定に届くようにする。1回目の生成は first_error、以降は later_error
+        （Noneなら成功）を送出する。
+        """
+        real_generate = GeminiImageAPIService.generate_images_from_reference
+        invocations = []
+
+        def generate(*args, **kwargs):
+            invocations.append(kwargs)
+            error = first_error if len(invocations) == 1 else later_error
+
+            def generate_content(**content_kwargs):
+                if error is not None:
+                    raise error
+                return SimpleNamespace(parts=[
+                    SimpleNamespace(text=None, inline_data=SimpleNamespace(data=b'\xff\xd8\xff\xd9'))
+                ])
+
+            client = SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+            with patch.object(GeminiImageAPIService, 'initialize_client', return_value=client), \
+                    patch.object(GeminiImageAPIService, 'load_image', return_value=b'input-bytes'):
+                return real_generate(*args, **kwargs)
+
+        with patch('images.tasks.GeminiImageAPIService.generate_images_from_reference', side_effect=generate):
+            result = process_image_conversion.apply(args=(conversion.id,)).get()
+        return result, invocations
+
+    def test_genai_rate_limit_and_server_errors_are_retried(self):
+        for status_code, error_class in ((429, genai_errors.ClientError), (503, genai_errors.ServerError)):
+            with self.subTest(status_code=status_code):
+                conversion = self._create_conversion(generation_count=1)
+                api_error = error_class(status_code, {'error': {'code': status_code}})
+
+                result, invocations = self._run_with_genai_errors(conversion, api_error)
+
+                self.assertEqual(result['status'], 'success')
+                self.assertEqual(len(invocations), 2)
+                conversion.refresh_from_db()
+                self.assertEqual(conversion.status, 'completed')
+
+    def test_genai_client_error_is_not_retried(self):
+        conversion = self._create_conversion(generation_count=1)
+        api_error = genai_errors.ClientError(400, {'error': {'code': 400, 'status': 'INVALID_ARGUMENT'}})
+
+        result, invocations = self._run_with_genai_errors(conversion, api_error, later_error=api_error)
+
+        self.assertEqual(result['status'], 'error')
+        self.assertEqual(len(invocations), 1)
+        conversion.refresh_from_db()
+        self.assertEqual(conversion.status, 'failed')
+
+    @patch('images.tasks.GeminiImageAPIService.generate_images_from_reference')
+    def test_completion_sent_directly_to_single_subscriber(self, mock_generate):
+        conversion = self._create_conversion(generation_count=1)
+        cache.set(ImageConversion.channel_name_key(conversion.id), 'conversion.subscriber')
+        mock_generate.return_value = (self._generated_results(1), GeminiImageAPIService.DEFAULT_MODEL)
+
+        layer = InMemoryChannelLayer()
+        async_to_sync(layer.group_add)(f'conversion_{conversion.id}', 'conversion.member')
+        self._run_with_channel_layer(conversion, layer)
+
+        # 途中経過はグループへ、画像一覧を含む完了通知のみ購読者へ直接届く
+        completion = self._receive_until_completed(layer, 'conversion.subscriber')
+        self.assertEqual(len(completion), 1)
+        self.assertEqual(len(completion[0]['images']), 1)
+
+        async def receive_progress():
+            return [await asyncio.wait_for(layer.receive('conversion.member'), timeout=1) for _ in range(3)]
+
+        progress = async_to_sync(receive_progress)()
+        self.assertEqual([m['progress'] for m in progress], [10, 30, 70])
+
+    @patch('images.tasks.GeminiImageAPIService.generate_images_from_reference')
+    def test_completion_falls_back_to_group_when_cache_is_down(self, mock_generate):
+        conversion = self._create_conversion(generation_count=1)
+        mock_generate.return_value = (self._generated_results(1), GeminiImageAPIService.DEFAULT_MODEL)
+        channel_key = ImageConversion.channel_name_key(conversion.id)
+        cache_get = cache.get
+
+        def get(key, *args, **kwargs):
+            if key == channel_key:
+                raise ConnectionError('cache is down')
+            return cache_get(key, *args, **kwargs)
+
+        layer = InMemoryChannelLayer()
+        async_to_sync(layer.group_add)(f'conversion_{conversion.id}', 'conversion.member')
+        with patch('images.models.cache.get', side_effect=get):
+            result = self._run_with_channel_layer(conversion, layer)
+
+        self.assertEqual(result['status'], 'success')
+        messages = self._receive_until_completed(layer, 'conversion.member')
+        self.assertEqual(len(messages[-1]['images']), 1)
+
+    @patch('images.tasks._ensure_not_cancelled_in_db')
+    @patch('images.tasks.GeminiImageAPIService.generate_images_from_reference')
+    def test_cancel_after_records_created_removes_files_and_rows(self, mock_generate, mock_check):
+        conversion = self._create_conversion(generation_count=2)
+        mock_generate.return_value = (self._generated_results(2), GeminiImageAPIService.DEFAULT_MODEL)
+        mock_check.side_effect = ConversionCancelledError('cancelled')
+
+        result = process_image_conversion.apply(args=(conversion.id,)).get()
+
+        self.assertEqual(result['status'], 'cancelled')
+        self.assertFalse(GeneratedImage.objects.filter(conversion=conversion).exists())
+        output_dir = os.path.join(self.temp_media, f'generated/user_{self.user.id}')
+        self.assertEqual(os.listdir(output_dir), [])
+
+    @patch('images.tasks.GeminiImageAPIService.generate_images_from_reference')
+    def test_partial_fallback_refunds_usage(self, mock_generate):
+        conversion = self._create_conversion(generation_count=2)
+        conversion.model_name = 'gemini-3-pro-image-preview'
+        conversion.usage_consumed = 10
+        conversion.save()
+        profile = self.user.profile
+        profile.monthly_used = 10
+        profile.save()
+
+        results = self._generated_results(2)
+        results[0]['model_used'] = 'gemini-3-pro-image-preview'
+        mock_generate.return_value = (results, 'gemini-3-pro-image-preview')
+
+        result = process_image_conversion.apply(args=(conversion.id,)).get()
+
+        self.assertEqual(result['status'], 'success')
+        conversion.refresh_from_db()
+        self.assertEqual(conversion.usage_consumed, 6)
+        profile.refresh_from_db()
+        self.assertEqual(profile.monthly_used, 6)
+        fallback = cache.get(f'conversion_fallback_{conversion.id}')
+        self.assertEqual(fallback['used_model'], 'mixed')
+        self.assertEqual(fallback['refund'], 4)
+
+    @patch('images.tasks.GeminiImageAPIService.generate_images_from_reference')
+    def test_already_finished_conversion_is_skipped(self, mock_generate):
+        conversion = self._create_conversion(generation_count=1)
+        ImageConversion.objects.filter(pk=conversion.pk).update(status='completed')
+
+        with self.assertNumQueries(1):
+            result = process_image_conversion.apply(args=(conversion.id,)).get()
+
+        self.assertEqual(result['status'], 'completed')
+        mock_generate.assert_not_called()
@@ -5,11 +5,11 @@ Gemini 2.5 Flash Image API 接続テスト
 import os
 import django
 
-# Django設定を読み込む
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
-django.setup()
 
-from images.services.gemini_image_api import GeminiImageAPIService
+def setup_django():
+    """Django設定を読み込む（import時ではなく、実際に必要になった時点で呼ぶ）"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    django.setup()
 
 
 def main():
@@ -30,9 +30,12 @@ def main():
     print(f"  認証ファイル存在: {os.path.exists(credentials_path) if credentials_path else False}")
     print()
 
-    # 接続テスト
+    # 接続テスト（環境変数の確認にはDjangoが不要なため、ここで初期化する）
     print("[2] API接続テスト")
     try:
+        setup_django()
+        from images.services.gemini_image_api import GeminiImageAPIService
+
         result = GeminiImageAPIService.test_connection()
 
         print(f"  結果: {'成功' if result['success'] else '失敗'}")
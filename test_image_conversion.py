@@ -6,17 +6,109 @@
 """
 import os
 import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
 import django
 
-# Django設定を読み込む
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
-django.setup()
 
-from images.services.gemini_image_api import GeminiImageAPIService, GeminiImageAPIError
+def setup_django():
+    """Django設定を読み込む（import時ではなく、実際に必要になった時点で呼ぶ）"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    django.setup()
+
+
+def run_one(idx, total, test_image):
+    """
+    1枚の画像の変換と保存を行い、出力をまとめた文字列を返す
+
+    複数スレッドから呼ばれるため、表示が混ざらないよう
+    printせずに出力をためて最後にまとめて返す。
+    """
+    from images.services.gemini_image_api import GeminiImageAPIService, GeminiImageAPIError
+
+    lines = []
+    log = lines.append
+
+    log(f"\n{'=' * 70}")
+    log(f"テスト {idx}/{total}: {test_image['name']}")
+    log(f"{'=' * 70}")
+    log(f"元画像: {test_image['path']}")
+    log(f"プロンプト: {test_image['prompt'][:80]}...")
+    log("")
+
+    try:
+        # 画像が存在するか確認
+        full_path = os.path.join('media', test_image['path'])
+        if not os.path.exists(full_path):
+            log(f"❌ エラー: 画像ファイルが見つかりません: {full_path}")
+            return "\n".join(lines)
+
+        log(f"[1/3] 画像変換を開始...")
+
+        # 画像変換実行（3枚生成）
+        results, model_used = GeminiImageAPIService.generate_images_from_reference(
+            original_image_path=test_image['path'],
+            prompt=test_image['prompt'],
+            generation_count=3,
+            aspect_ratio='4:3'
+        )
+
+        log(f"✅ {len(results)}枚の画像を生成しました（使用モデル: {model_used}）")
+        log("")
+
+        # 生成画像を保存
+        log(f"[2/3] 生成画像を保存中...")
+        output_dir = f"test_generated/{os.path.splitext(test_image['name'])[0]}"
+
+        def save(item):
+            i, result = item
+            try:
+                return GeminiImageAPIService.save_generated_image(
+                    image_data=result['image_data'],
+                    output_dir=output_dir,
+                    filename=f"generated_{i}.jpg"
+                ), None
+            except Exception as e:
+                return None, e
+
+        # 各画像の保存は独立しているため並列に行い、表示は生成順に揃える
+        with ThreadPoolExecutor(max_workers=max(1, min(4, len(results)))) as executor:
+            saved = list(executor.map(save, enumerate(results, 1)))
+
+        for i, (result, (outcome, error)) in enumerate(zip(results, saved), 1):
+            if error is not None:
+                log(f"  ❌ 画像 {i} の保存に失敗: {str(error)}")
+                continue
+
+            relative_path, file_size = outcome
+            file_size_kb = file_size / 1024
+
+            log(f"  ✅ 画像 {i}: {relative_path} ({file_size_kb:.1f} KB)")
+
+            if result.get('description'):
+                log(f"     説明: {result['description'][:100]}...")
+
+        log("")
+        log(f"[3/3] テスト完了")
+        log(f"✅ {test_image['name']} の変換が成功しました！")
+        log(f"   保存先: media/{output_dir}/")
+
+    except GeminiImageAPIError as e:
+        log(f"❌ Gemini APIエラー: {str(e)}")
+        log(traceback.format_exc())
+
+    except Exception as e:
+        log(f"❌ 予期しないエラー: {str(e)}")
+        log(traceback.format_exc())
+
+    return "\n".join(lines)
 
 
 def test_image_conversion():
     """画像変換テスト"""
+    setup_django()
+
     print("=" * 70)
     print("Gemini 2.5 Flash Image - 画像変換テスト")
     print("=" * 70)
@@ -36,75 +128,15 @@ def test_image_conversion():
         }
     ]
 
-    # 各画像でテスト
-    for idx, test_image in enumerate(test_images, 1):
-        print(f"\n{'=' * 70}")
-        print(f"テスト {idx}/{len(test_images)}: {test_image['name']}")
-        print(f"{'=' * 70}")
-        print(f"元画像: {test_image['path']}")
-        print(f"プロンプト: {test_image['prompt'][:80]}...")
-        print()
-
-        try:
-            # 画像が存在するか確認
-            full_path = os.path.join('media', test_image['path'])
-            if not os.path.exists(full_path):
-                print(f"❌ エラー: 画像ファイルが見つかりません: {full_path}")
-                continue
-
-            print(f"[1/3] 画像変換を開始...")
-
-            # 画像変換実行（3枚生成）
-            results, model_used = GeminiImageAPIService.generate_images_from_reference(
-                original_image_path=test_image['path'],
-                prompt=test_image['prompt'],
-                generation_count=3,
-                aspect_ratio='4:3'
-            )
-
-            print(f"✅ {len(results)}枚の画像を生成しました（使用モデル: {model_used}）")
-            print()
-
-            # 生成画像を保存
-            print(f"[2/3] 生成画像を保存中...")
-            output_dir = f"test_generated/{os.path.splitext(test_image['name'])[0]}"
-
-            for i, result in enumerate(results, 1):
-                filename = f"generated_{i}.jpg"
-
-                try:
-                    relative_path = GeminiImageAPIService.save_generated_image(
-                        image_data=result['image_data'],
-                        output_dir=output_dir,
-                        filename=filename
-                    )
-
-                    full_save_path = os.path.join('media', relative_path)
-                    file_size = os.path.getsize(full_save_path)
-                    file_size_kb = file_size / 1024
-
-                    print(f"  ✅ 画像 {i}: {relative_path} ({file_size_kb:.1f} KB)")
-
-                    if result.get('description'):
-                        print(f"     説明: {result['description'][:100]}...")
-
-                except Exception as e:
-                    print(f"  ❌ 画像 {i} の保存に失敗: {str(e)}")
-
-            print()
-            print(f"[3/3] テスト完了")
-            print(f"✅ {test_image['name']} の変換が成功しました！")
-            print(f"   保存先: media/{output_dir}/")
-
-        except GeminiImageAPIError as e:
-            print(f"❌ Gemini APIエラー: {str(e)}")
-            import traceback
-            traceback.print_exc()
-
-        except Exception as e:
-            print(f"❌ 予期しないエラー: {str(e)}")
-            import traceback
-            traceback.print_exc()
+    # 各画像は独立しているため並列にテストし、結果は元の順序で表示する
+    total = len(test_images)
+    with ThreadPoolExecutor(max_workers=total) as executor:
+        outputs = executor.map(
+            lambda item: run_one(item[0], total, item[1]),
+            enumerate(test_images, 1)
+        )
+        for output in outputs:
+            print(output)
 
     print()
     print("=" * 70)
@@ -6,17 +6,20 @@ import os
 import sys
 import django
 
-# Django設定を読み込み
 sys.path.insert(0, os.path.dirname(__file__))
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
-django.setup()
 
-from django.conf import settings
-from images.services.prompt_improver import PromptImproverService, PromptImproverError
+
+def setup_django():
+    """Django設定を読み込む（import時ではなく、実際に必要になった時点で呼ぶ）"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    django.setup()
 
 
 def test_connection():
     """API接続テスト"""
+    from django.conf import settings
+    from images.services.prompt_improver import PromptImproverService
+
     print("=" * 60)
     print("プロンプト改善サービス - 接続テスト")
     print("=" * 60)
@@ -49,6 +52,9 @@ def test_connection():
 
 def test_improve_prompt():
     """プロンプト改善テスト"""
+    from django.conf import settings
+    from images.services.prompt_improver import PromptImproverService, PromptImproverError
+
     print("\n" + "=" * 60)
     print("プロンプト改善テスト")
     print("=" * 60)
@@ -68,18 +74,18 @@ def test_improve_prompt():
     try:
         service = PromptImproverService(api_key=api_key)
 
-        for i, test_prompt in enumerate(test_prompts, 1):
+        # 3件を1回のリクエストでまとめて改善
+        try:
+            improved_list = service.improve_prompts(test_prompts)
+        except PromptImproverError as e:
+            print(f"❌ 改善エラー: {e}")
+            return False
+
+        for i, (test_prompt, improved) in enumerate(zip(test_prompts, improved_list), 1):
             print(f"\n--- テスト {i} ---")
             print(f"元のプロンプト: {test_prompt}")
-
-            try:
-                improved = service.improve_prompt(test_prompt)
-                print(f"改善後のプロンプト:\n{improved}")
-                print("✅ 成功")
-
-            except PromptImproverError as e:
-                print(f"❌ 改善エラー: {e}")
-                return False
+            print(f"改善後のプロンプト:\n{improved}")
+            print("✅ 成功")
 
         print("\n" + "=" * 60)
         print("✅ 全てのテストが成功しました！")
@@ -97,6 +103,8 @@ def main():
     """メイン実行"""
     print("\n🚀 プロンプト改善サービステスト開始\n")
 
+    setup_django()
+
     # 1. 接続テスト
     if not test_connection():
         print("\n❌ 接続テストに失敗しました")